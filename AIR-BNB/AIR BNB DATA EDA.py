@@ -18,17 +18,25 @@
 
 
 # Let's import some basic libraries
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from listings import plot_counts, plot_summary, summarize_listings
+
+import sys
+sys.path.append('..')
+from edatools import GridIndex, profile_columns, profile_file, read_csv_cached, streaming_corr
 
 
 # In[2]:
 
 
 # Loading the dataset
-air_bnb = pd.read_csv('air_bnb.csv')
+air_bnb = read_csv_cached('air_bnb.csv', schema='air_bnb')
+
+# head, tail, shape, dtypes, nulls, distinct values and memory of every column in one pass,
+# cached until the csv changes
+report = profile_file('air_bnb.csv', schema='air_bnb')
 
 
 # ## 1 - Data Preprocessing
@@ -38,34 +46,34 @@ air_bnb = pd.read_csv('air_bnb.csv')
 
 
 # Checking the head and tail
-air_bnb.head()
+report.head
 
 
 # In[5]:
 
 
-air_bnb.tail()
+report.tail
 
 
 # In[9]:
 
 
 # check datatypes
-air_bnb.dtypes
+report.dtypes
 
 
 # In[10]:
 
 
 # checking info
-air_bnb.info()
+print(report.info())
 
 
 # In[11]:
 
 
 # null values
-air_bnb.isnull().sum()
+report.columns['nulls']
 
 
 # Let's remove the data where there are null values.
@@ -81,13 +89,14 @@ air_bnb = air_bnb.dropna(how='any', axis=0)
 
 
 # let's check again for null values
-air_bnb.isnull().sum()
+profile = profile_columns(air_bnb)
+profile['nulls']
 
 
 # In[14]:
 
 
-air_bnb.info()
+profile[['dtype', 'count', 'memory']]
 
 
 # After removing the null values the shape of the data has also changed. We remove the data for simplicity's sake and not impute of fill with any other data.
@@ -95,7 +104,7 @@ air_bnb.info()
 # In[23]:
 
 
-air_bnb.nunique()
+profile['unique']
 
 
 # In[16]:
@@ -109,6 +118,14 @@ air_bnb.shape
 
 # ## 2 - Exploratory Data Analysis
 
+# Every bar chart below is drawn from one table with the mean, count and 95% confidence interval of each metric per neighbourhood group and room type. `listings.bootstrap_ci` gives bootstrap intervals instead, if wanted.
+
+# In[30]:
+
+
+listing_stats = summarize_listings(air_bnb)
+listing_stats
+
 # In[32]:
 
 
@@ -116,13 +133,12 @@ air_bnb.shape
 sns.set_style('darkgrid')
 palettes=['inferno','plasma','magma','cividis','Oranges','Greens','YlOrBr', 
           'YlOrRd', 'OrRd','Greys', 'Purples', 'Blues']
-def plot_unique_num(df):
-    
-    column=[]
-    unique_values=[]
-    for col in df.columns:
-        column.append(col)
-        unique_values.append(df[col].nunique())
+def plot_unique_num(df, profile=None):
+    # distinct counts come from the column profile instead of a nunique() per column
+    if profile is None:
+        profile = profile_columns(df)
+    column = list(df.columns)
+    unique_values = profile.loc[column, 'unique'].tolist()
 
     fig, ax = plt.subplots(figsize=(8,8))
     sns.barplot(x = unique_values, y = column, ax = ax, palette =palettes[np.random.randint(0,12)])
@@ -139,8 +155,8 @@ def plot_unique_num(df):
 # In[33]:
 
 
-categorical_features = air_bnb.select_dtypes(include='object')
-plot_unique_num(categorical_features)
+categorical_features = air_bnb.select_dtypes(include=['object', 'category'])
+plot_unique_num(categorical_features, profile)
 
 
 # In[34]:
@@ -148,7 +164,7 @@ plot_unique_num(categorical_features)
 
 # unique  numerical values
 numeric_features = air_bnb.select_dtypes(include=['float', 'integer'])
-plot_unique_num(numeric_features)
+plot_unique_num(numeric_features, profile)
 
 
 # Neighborhood groups and counts of rooms
@@ -156,12 +172,7 @@ plot_unique_num(numeric_features)
 # In[43]:
 
 
-plt.figure(figsize=(15,6))
-ax = sns.countplot(x='neighbourhood_group', data=air_bnb)
-plt.title('Count according to neighborhood group')
-
-for p in ax.patches:
-        ax.annotate('{}'.format(p.get_height()), (p.get_x()+0.1, p.get_height()+50))
+plot_counts(listing_stats, hue=False, title='Count according to neighborhood group')
 
 
 # As the data suggests, most of the rooms in rent are in the Brooklyn/Manhattan area. Fewer rooms are available in the Staten Island than other neighborhood. 
@@ -184,10 +195,8 @@ sns.boxenplot(x='neighbourhood_group', y='price', data=air_bnb, hue='room_type')
 
 
 # Average minimum nights according to room type across different groups
-plt.figure(figsize=(15,6))
-plt.title('Average minimum nights according to room type across different groups')
-
-sns.barplot(x='neighbourhood_group', y='minimum_nights', hue='room_type', data=air_bnb)
+plot_summary(listing_stats, 'minimum_nights',
+             title='Average minimum nights according to room type across different groups')
 
 
 # Across all the Neighbourhood groups, we can see the trend that if you wish to rent an entire home or apartment, you need to rent for an average 4 nights. In manhattan, it goes up to more than 8 nights in average.
@@ -196,44 +205,31 @@ sns.barplot(x='neighbourhood_group', y='minimum_nights', hue='room_type', data=a
 
 
 # Average price according to room type across different groups
-plt.figure(figsize=(15,6))
-plt.title('Average price according to room type across different groups')
-
-sns.barplot(x='neighbourhood_group', y='price', hue='room_type', data=air_bnb, palette='Greys')
+plot_summary(listing_stats, 'price',
+             title='Average price according to room type across different groups', palette='Greys')
 
 
 # In[67]:
 
 
 # Calculated host listing count to room type across different groups
-plt.figure(figsize=(15,6))
-plt.title('Calculated host listing count to room type across different groups')
-
-sns.barplot(x='neighbourhood_group', y='calculated_host_listings_count', 
-            hue='room_type', data=air_bnb, palette='Blues')
+plot_summary(listing_stats, 'calculated_host_listings_count',
+             title='Calculated host listing count to room type across different groups', palette='Blues')
 
 
 # In[70]:
 
 
 # variation in avalibiity across different  groups
-plt.figure(figsize=(15,6))
-plt.title('variation in avalibiity across different  groups')
-
-sns.barplot(x='neighbourhood_group', y='availability_365', 
-            hue='room_type', data=air_bnb, palette='Greens')
+plot_summary(listing_stats, 'availability_365',
+             title='variation in avalibiity across different  groups', palette='Greens')
 
 
 # In[73]:
 
 
 # No. of rooms in different grouptypes
-plt.figure(figsize=(15,6))
-plt.title('No. of rooms')
-
-ax = sns.countplot(x='neighbourhood_group', hue='room_type', data=air_bnb)
-for p in ax.patches:
-        ax.annotate('{}'.format(p.get_height()), (p.get_x()+0.1, p.get_height()+50))
+plot_counts(listing_stats, title='No. of rooms')
 
 
 # Manhattan offers the most number of entire home or apartment options but if you are looking for private rooms, Brooklyn may offer more choices. In Queens, Staten Island and Bronx the numbers are relatively low.
@@ -242,10 +238,7 @@ for p in ax.patches:
 
 
 # Average number of reviews per month count acc to room_type
-plt.figure(figsize=(15,6))
-plt.title('Average reviews per month')
-
-sns.barplot(x='neighbourhood_group', y='reviews_per_month', hue='room_type', data=air_bnb)
+plot_summary(listing_stats, 'reviews_per_month', title='Average reviews per month')
 
 
 # In[74]:
@@ -266,6 +259,40 @@ plt.xlabel("Number of guest Who host in this Area")
 plt.barh(x, y)
 
 
+# #### Where the listings are
+# A grid index over the listing coordinates (500 m cells) answers area queries by looking only at the cells they cover.
+
+# In[75]:
+
+
+grid = GridIndex(air_bnb['latitude'], air_bnb['longitude'], cell_km=0.5)
+
+density, extent = grid.density()
+plt.figure(figsize=(12, 12))
+plt.imshow(np.log1p(density), origin='lower', extent=extent, cmap='magma', aspect='auto')
+plt.colorbar(label='log(1 + listings per cell)')
+plt.title('Listing density')
+plt.xlabel('Longitude')
+plt.ylabel('Latitude')
+plt.show()
+
+
+# In[76]:
+
+
+# median price within 1 km of Times Square
+near = grid.radius(40.758, -73.9855, km=1)
+print(f"{len(near)} listings, median price ${air_bnb['price'].iloc[near].median():.0f}")
+
+
+# In[77]:
+
+
+# most expensive cells with at least 20 listings
+price_cells = grid.cell_stats(air_bnb['price'], median=True)
+price_cells[price_cells['count'] >= 20].sort_values('median', ascending=False).head(10)
+
+
 # #### I've heard there are some free houses/rooms, let's find out
 
 # In[80]:
@@ -316,9 +343,11 @@ sns.countplot(x='neighbourhood', hue='room_type', data=free)
 # In[93]:
 
 
+# numeric columns only, accumulated chunk by chunk; streaming_corr also takes a glob of
+# listing files (e.g. one per city) and correlates them without loading them together
 sns.set(font_scale=3)
 plt.figure(figsize=(30, 20))
-sns.heatmap(air_bnb.corr(), annot=True)
+sns.heatmap(streaming_corr(air_bnb), annot=True)
 
 
 # # Thanks for checking out.
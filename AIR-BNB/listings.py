@@ -0,0 +1,102 @@
+# coding: utf-8
+"""Per (neighbourhood_group, room_type) summaries of the listings.
+
+seaborn's ``barplot`` regroups the whole frame and bootstraps a confidence
+interval every time it is called. ``summarize_listings`` instead computes
+the mean, standard deviation, count and a normal-approximation confidence
+interval of every metric for every cell in one ``groupby().agg()``, and the
+charts are drawn from that small table. ``bootstrap_ci`` gives bootstrap
+intervals for the same cells when they are wanted, resampling all metrics
+of a cell at once.
+"""
+
+from statistics import NormalDist
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+METRICS = ['price', 'minimum_nights', 'calculated_host_listings_count',
+           'availability_365', 'reviews_per_month']
+GROUPS = ['neighbourhood_group', 'room_type']
+
+
+def summarize_listings(df, metrics=METRICS, by=GROUPS, ci=0.95):
+    """mean, std, count and CI half-width of each metric for each cell of ``by``.
+
+    Columns are a (metric, stat) MultiIndex, plus ``('listings', 'count')``
+    with the number of rows in each cell. The interval is mean +/- ``ci``
+    over the normal quantile times the standard error.
+    """
+    grouped = df.groupby(list(by), observed=True)
+    summary = grouped[list(metrics)].agg(['mean', 'std', 'count'])
+    z = NormalDist().inv_cdf(0.5 + ci / 2)
+    for metric in metrics:
+        stats = summary[metric]
+        summary[(metric, 'ci')] = z * stats['std'] / np.sqrt(stats['count'])
+    summary[('listings', 'count')] = grouped.size()
+    order = [(metric, stat) for metric in metrics for stat in ('mean', 'std', 'count', 'ci')]
+    return summary[order + [('listings', 'count')]]
+
+
+def bootstrap_ci(df, metrics=METRICS, by=GROUPS, ci=0.95, n_boot=1000, seed=0, max_draws=2000000):
+    """Percentile bootstrap interval of the mean of each metric for each cell.
+
+    Every resample of a cell draws one set of row positions and takes the
+    means of all metrics from it. Resamples are drawn in batches of at most
+    ``max_draws`` positions to bound memory. Returns a frame indexed like
+    ``summarize_listings`` with (metric, 'ci_low'/'ci_high') columns.
+    """
+    rng = np.random.default_rng(seed)
+    metrics = list(metrics)
+    quantiles = [(1 - ci) / 2, (1 + ci) / 2]
+    rows = {}
+    for key, cell in df.groupby(list(by), observed=True)[metrics]:
+        values = cell.to_numpy(dtype=float)
+        n, has_nan = len(values), np.isnan(values).any()
+        batch = max(1, max_draws // n)
+        means = []
+        for start in range(0, n_boot, batch):
+            draws = rng.integers(0, n, size=(min(batch, n_boot - start), n))
+            sample = values[draws]
+            if has_nan:
+                with np.errstate(invalid='ignore'):
+                    means.append(np.nanmean(sample, axis=1))
+            else:
+                means.append(sample.mean(axis=1))
+        low, high = np.nanquantile(np.concatenate(means), quantiles, axis=0)
+        rows[key] = np.ravel(np.column_stack((low, high)))
+    columns = pd.MultiIndex.from_product([metrics, ['ci_low', 'ci_high']])
+    index = pd.MultiIndex.from_tuples(list(rows), names=list(by))
+    return pd.DataFrame(list(rows.values()), index=index, columns=columns)
+
+
+def plot_summary(summary, metric, title=None, palette=None, ax=None):
+    """Bar chart of a metric's mean per cell with its CI as error bars.
+
+    Draws the same chart as ``sns.barplot(x=by[0], y=metric, hue=by[1])``
+    from the summary table.
+    """
+    stats = summary[metric]
+    means, errors = stats['mean'].unstack(), stats['ci'].unstack()
+    if ax is None:
+        _, ax = plt.subplots(figsize=(15, 6))
+    means.plot.bar(yerr=errors, ax=ax, rot=0, colormap=palette, capsize=3)
+    ax.set_ylabel(metric)
+    if title:
+        ax.set_title(title)
+    return ax
+
+
+def plot_counts(summary, hue=True, title=None, ax=None):
+    """Number of listings per neighbourhood group (per room type with ``hue``), annotated."""
+    counts = summary[('listings', 'count')]
+    counts = counts.unstack() if hue else counts.groupby(level=0, observed=True).sum()
+    if ax is None:
+        _, ax = plt.subplots(figsize=(15, 6))
+    counts.plot.bar(ax=ax, rot=0, legend=hue)
+    for p in ax.patches:
+        ax.annotate('{:.0f}'.format(p.get_height()), (p.get_x() + 0.1, p.get_height() + 50))
+    if title:
+        ax.set_title(title)
+    return ax
@@ -25,9 +25,13 @@
 
 # import necessary libraries
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from crops import crop_cube, crop_frame, district_series, national_totals, rank_districts
+
+import sys
+sys.path.append('..')
+from edatools import profile_file, read_csv_cached
 
 
 # In[2]:
@@ -59,21 +63,23 @@ plt.rcParams["figure.figsize"] = (18, 10)
 
 
 # loading the csv data from source
-data = pd.read_csv("/home/rupakkarki/Desktop/RUPAK/datasets/District level cereal crop production in Nepal/data/nepal_crop.csv")
+data_path = "/home/rupakkarki/Desktop/RUPAK/datasets/District level cereal crop production in Nepal/data/nepal_crop.csv"
+data = read_csv_cached(data_path, schema="nepal_crop")
+report = profile_file(data_path, schema="nepal_crop")
 
 
 # In[5]:
 
 
 # first 5 rows
-data.head()
+report.head
 
 
 # In[6]:
 
 
 # Shape of the data
-data.shape
+report.shape
 
 
 # This dataset contains information about 75 districts and crop production for them.
@@ -87,20 +93,17 @@ data.shape
 # In[127]:
 
 
-paddy = pd.concat([pd.Series(data["DISTRICT_NAME"]),
-                   data[data.columns[data.columns.str.contains("PD_")]]], axis=1)
-
-wheat = pd.concat([pd.Series(data["DISTRICT_NAME"]),
-                   data[data.columns[data.columns.str.contains("WT_")]]], axis=1)
-
-maize = pd.concat([pd.Series(data["DISTRICT_NAME"]),
-                   data[data.columns[data.columns.str.contains("MZ_")]]], axis=1)
+# parse the XX_M_YYYYYY column names once into a (crop, metric, fiscal year) MultiIndex
+cube = crop_cube(data)
 
-millet = pd.concat([pd.Series(data["DISTRICT_NAME"]),
-                    data[data.columns[data.columns.str.contains("ML_")]]], axis=1)
+paddy = crop_frame(cube, "PD")
+wheat = crop_frame(cube, "WT")
+maize = crop_frame(cube, "MZ")
+millet = crop_frame(cube, "ML")
+barley = crop_frame(cube, "BL")
 
-barley = pd.concat([pd.Series(data["DISTRICT_NAME"]),
-                    data[data.columns[data.columns.str.contains("BL_")]]], axis=1)
+# national production, area and yield series of every crop in one pass
+totals = national_totals(cube)
 
 
 # # **Data Visualization**
@@ -121,7 +124,7 @@ paddy.head()
 # In[298]:
 
 
-paddy_prod = paddy[paddy.columns[paddy.columns.str.contains("PD_P")]].sum()
+paddy_prod = totals.loc[("PD", "P")]
 paddy_prod.iplot(title="Production of Paddy over time",
                  xTitle="Fiscal Year", yTitle="Production (in million tons)", mode="lines+markers", size=10)
 
@@ -131,7 +134,7 @@ paddy_prod.iplot(title="Production of Paddy over time",
 # In[162]:
 
 
-paddy_area = paddy[paddy.columns[paddy.columns.str.contains("PD_A")]].sum()
+paddy_area = totals.loc[("PD", "A")]
 paddy_area.iplot(title="Area of Paddy Cultivation over time",
                  xTitle="Fiscal Year", yTitle="Area (in hectars)", mode="lines+markers", size=10)
 
@@ -141,7 +144,7 @@ paddy_area.iplot(title="Area of Paddy Cultivation over time",
 # In[192]:
 
 
-paddy_yield = paddy[paddy.columns[paddy.columns.str.contains("PD_Y")]].sum()
+paddy_yield = totals.loc[("PD", "Y")]
 paddy_yield.iplot(title="Paddy Yield over time",
                  xTitle="Fiscal Year", yTitle="Yield (kg/hecter)", mode="lines+markers", size=10)
 
@@ -151,17 +154,16 @@ paddy_yield.iplot(title="Paddy Yield over time",
 # In[105]:
 
 
-# sum of all productions over the years in descending order
-paddy_top = paddy.sum(axis=1)
-paddy_top = pd.concat([pd.Series(data["DISTRICT_NAME"]),paddy_top], axis=1)
-paddy_top = paddy_top.sort_values(by=0, ascending=False)
-paddy_top.set_index("DISTRICT_NAME", inplace=True)
+# total production (PD_P columns only) of every district, for all crops at once
+top, bottom = rank_districts(cube, n=10, metric="P")
+# most and least producing districts over the years, in descending order
+paddy_top, paddy_bottom = top["PD"], bottom["PD"]
 
 
 # In[140]:
 
 
-paddy_top[:10].iplot(kind="bar", title="Top 10 most paddy producers till FY 2013/14",
+paddy_top.iplot(kind="bar", title="Top 10 most paddy producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
@@ -171,17 +173,15 @@ paddy_top[:10].iplot(kind="bar", title="Top 10 most paddy producers till FY 2013
 
 
 top_dist_paddy = ["Jhapa", "Morang", "Rupandehi", "Bara", "Kapilbastu"]
-jhapa = paddy[paddy["DISTRICT_NAME"] == top_dist_paddy[0]].transpose()
-morang = paddy[paddy["DISTRICT_NAME"] == top_dist_paddy[1]].transpose()
-rupandehi = paddy[paddy["DISTRICT_NAME"] == top_dist_paddy[2]].transpose()
-bara = paddy[paddy["DISTRICT_NAME"] == top_dist_paddy[3]].transpose()
-kapilbastu = paddy[paddy["DISTRICT_NAME"] == top_dist_paddy[4]].transpose()
+# one indexed lookup for all five districts: (metric, fiscal year) rows, one column per district
+top_dist_series = district_series(cube, top_dist_paddy, crop="PD")
+jhapa, morang, rupandehi, bara, kapilbastu = (top_dist_series[d] for d in top_dist_paddy)
 
 
 # In[139]:
 
 
-paddy_top[-10:].iplot(kind="bar",title="Top 10 Least paddy producers till FY 2013/14",
+paddy_bottom.iplot(kind="bar",title="Top 10 Least paddy producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
@@ -192,7 +192,7 @@ paddy_top[-10:].iplot(kind="bar",title="Top 10 Least paddy producers till FY 201
 # In[276]:
 
 
-wheat_prod = wheat[wheat.columns[wheat.columns.str.contains("WT_P")]].sum()
+wheat_prod = totals.loc[("WT", "P")]
 wheat_prod.iplot(title="Production of Wheat over time",
                  xTitle="Fiscal Year", yTitle="Production (in million tons)", mode="lines+markers", size=10)
 
@@ -202,7 +202,7 @@ wheat_prod.iplot(title="Production of Wheat over time",
 # In[194]:
 
 
-wheat_area = wheat[wheat.columns[wheat.columns.str.contains("WT_A")]].sum()
+wheat_area = totals.loc[("WT", "A")]
 wheat_area.iplot(title="Area of Wheat Cultivation over time",
                  xTitle="Fiscal Year", yTitle="Area (in hectars)", mode="lines+markers", size=10)
 
@@ -212,7 +212,7 @@ wheat_area.iplot(title="Area of Wheat Cultivation over time",
 # In[195]:
 
 
-wheat_yield = wheat[wheat.columns[wheat.columns.str.contains("WT_Y")]].sum()
+wheat_yield = totals.loc[("WT", "Y")]
 wheat_yield.iplot(title="Wheat Yield over time",
                  xTitle="Fiscal Year", yTitle="Yield (kg/hecter)", mode="lines+markers", size=10)
 
@@ -222,24 +222,21 @@ wheat_yield.iplot(title="Wheat Yield over time",
 # In[134]:
 
 
-# sum of all productions over the years in descending order
-wheat_top = wheat.sum(axis=1)
-wheat_top = pd.concat([pd.Series(data["DISTRICT_NAME"]),wheat_top], axis=1)
-wheat_top = wheat_top.sort_values(by=0, ascending=False)
-wheat_top.set_index("DISTRICT_NAME", inplace=True)
+# most and least producing districts over the years, in descending order
+wheat_top, wheat_bottom = top["WT"], bottom["WT"]
 
 
 # In[199]:
 
 
-wheat_top[:10].iplot(kind="bar", title="Top 10 most wheat producers till FY 2013/14",
+wheat_top.iplot(kind="bar", title="Top 10 most wheat producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
 # In[198]:
 
 
-wheat_top[-10:].iplot(kind="bar",title="Top 10 Least wheat producers till FY 2013/14",
+wheat_bottom.iplot(kind="bar",title="Top 10 Least wheat producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
@@ -248,7 +245,7 @@ wheat_top[-10:].iplot(kind="bar",title="Top 10 Least wheat producers till FY 201
 # In[200]:
 
 
-maize_prod = maize[maize.columns[maize.columns.str.contains("MZ_P")]].sum()
+maize_prod = totals.loc[("MZ", "P")]
 maize_prod.iplot(title="Production of Maize over time",
                  xTitle="Fiscal Year", yTitle="Production (in million tons)", mode="lines+markers", size=10)
 
@@ -256,7 +253,7 @@ maize_prod.iplot(title="Production of Maize over time",
 # In[201]:
 
 
-maize_area = maize[maize.columns[maize.columns.str.contains("MZ_A")]].sum()
+maize_area = totals.loc[("MZ", "A")]
 maize_area.iplot(title="Area of Maize Cultivation over time",
                  xTitle="Fiscal Year", yTitle="Area (in hectars)", mode="lines+markers", size=10)
 
@@ -264,7 +261,7 @@ maize_area.iplot(title="Area of Maize Cultivation over time",
 # In[202]:
 
 
-maize_yield = maize[maize.columns[maize.columns.str.contains("MZ_Y")]].sum()
+maize_yield = totals.loc[("MZ", "Y")]
 maize_yield.iplot(title="Maize Yield over time",
                  xTitle="Fiscal Year", yTitle="Yield (kg/hecter)", mode="lines+markers", size=10)
 
@@ -272,24 +269,21 @@ maize_yield.iplot(title="Maize Yield over time",
 # In[144]:
 
 
-# sum of all productions over the years in descending order
-maize_top = maize.sum(axis=1)
-maize_top = pd.concat([pd.Series(data["DISTRICT_NAME"]),maize_top], axis=1)
-maize_top = maize_top.sort_values(by=0, ascending=False)
-maize_top.set_index("DISTRICT_NAME", inplace=True)
+# most and least producing districts over the years, in descending order
+maize_top, maize_bottom = top["MZ"], bottom["MZ"]
 
 
 # In[145]:
 
 
-maize_top[:10].iplot(kind="bar", title="Top 10 most wheat producers till FY 2013/14",
+maize_top.iplot(kind="bar", title="Top 10 most maize producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
 # In[146]:
 
 
-maize_top[-10:].iplot(kind="bar", title="Top 10 least wheat producers till FY 2013/14",
+maize_bottom.iplot(kind="bar", title="Top 10 least maize producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
@@ -298,7 +292,7 @@ maize_top[-10:].iplot(kind="bar", title="Top 10 least wheat producers till FY 20
 # In[203]:
 
 
-millet_prod = millet[millet.columns[millet.columns.str.contains("ML_P")]].sum()
+millet_prod = totals.loc[("ML", "P")]
 millet_prod.iplot(title="Production of Millet over time",
                  xTitle="Fiscal Year", yTitle="Production (in million tons)", mode="lines+markers", size=10)
 
@@ -306,7 +300,7 @@ millet_prod.iplot(title="Production of Millet over time",
 # In[204]:
 
 
-millet_area = millet[millet.columns[millet.columns.str.contains("ML_A")]].sum()
+millet_area = totals.loc[("ML", "A")]
 millet_area.iplot(title="Area of Millet Cultivation over time",
                  xTitle="Fiscal Year", yTitle="Area (in hectars)", mode="lines+markers", size=10)
 
@@ -314,7 +308,7 @@ millet_area.iplot(title="Area of Millet Cultivation over time",
 # In[205]:
 
 
-millet_yield = millet[millet.columns[millet.columns.str.contains("ML_Y")]].sum()
+millet_yield = totals.loc[("ML", "Y")]
 millet_yield.iplot(title="Millet Yield over time",
                  xTitle="Fiscal Year", yTitle="Yield (kg/hectar)", mode="lines+markers", size=10)
 
@@ -322,24 +316,21 @@ millet_yield.iplot(title="Millet Yield over time",
 # In[150]:
 
 
-# sum of all productions over the years in descending order
-millet_top = millet.sum(axis=1)
-millet_top = pd.concat([pd.Series(data["DISTRICT_NAME"]),millet_top], axis=1)
-millet_top = millet_top.sort_values(by=0, ascending=False)
-millet_top.set_index("DISTRICT_NAME", inplace=True)
+# most and least producing districts over the years, in descending order
+millet_top, millet_bottom = top["ML"], bottom["ML"]
 
 
 # In[152]:
 
 
-millet_top[:10].iplot(kind="bar", title="Top 10 most Millet producers till FY 2013/14",
+millet_top.iplot(kind="bar", title="Top 10 most Millet producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
 # In[151]:
 
 
-millet_top[-10:].iplot(kind="bar",title="Top 10 least Millet producers till FY 2013/14",
+millet_bottom.iplot(kind="bar",title="Top 10 least Millet producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
@@ -348,7 +339,7 @@ millet_top[-10:].iplot(kind="bar",title="Top 10 least Millet producers till FY 2
 # In[206]:
 
 
-barley_prod = barley[barley.columns[barley.columns.str.contains("BL_P")]].sum()
+barley_prod = totals.loc[("BL", "P")]
 barley_prod.iplot(title="Production of Barley over time",
                  xTitle="Fiscal Year", yTitle="Production (in million tons)", mode="lines+markers", size=10)
 
@@ -356,7 +347,7 @@ barley_prod.iplot(title="Production of Barley over time",
 # In[207]:
 
 
-barley_area = barley[barley.columns[barley.columns.str.contains("BL_A")]].sum()
+barley_area = totals.loc[("BL", "A")]
 barley_area.iplot(title="Area of Barley Cultivation over time",
                  xTitle="Fiscal Year", yTitle="Area (in hectars)", mode="lines+markers", size=10)
 
@@ -364,7 +355,7 @@ barley_area.iplot(title="Area of Barley Cultivation over time",
 # In[208]:
 
 
-barley_yield = barley[barley.columns[barley.columns.str.contains("BL_Y")]].sum()
+barley_yield = totals.loc[("BL", "Y")]
 barley_yield.iplot(title="Barley Yield over time",
                  xTitle="Fiscal Year", yTitle="Yield (kg/hectar)", mode="lines+markers", size=10)
 
@@ -372,24 +363,21 @@ barley_yield.iplot(title="Barley Yield over time",
 # In[157]:
 
 
-# sum of all productions over the years in descending order
-barley_top = barley.sum(axis=1)
-barley_top = pd.concat([pd.Series(data["DISTRICT_NAME"]),barley_top], axis=1)
-barley_top = barley_top.sort_values(by=0, ascending=False)
-barley_top.set_index("DISTRICT_NAME", inplace=True)
+# most and least producing districts over the years, in descending order
+barley_top, barley_bottom = top["BL"], bottom["BL"]
 
 
 # In[210]:
 
 
-barley_top[:10].iplot(kind="bar", title="Top 10 most Barley producers till FY 2013/14",
+barley_top.iplot(kind="bar", title="Top 10 most Barley producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
 # In[159]:
 
 
-barley_top[-10:].iplot(kind="bar",title="Top 10 least Barley producers till FY 2013/14",
+barley_bottom.iplot(kind="bar",title="Top 10 least Barley producers till FY 2013/14",
                     xTitle="Name of District", yTitle="Production  (Metric Tons)")
 
 
@@ -401,8 +389,7 @@ barley_top[-10:].iplot(kind="bar",title="Top 10 least Barley producers till FY 2
 import plotly.graph_objects as go
 fig = go.Figure()
 
-fy = list(paddy_prod.index)
-fy = [year[3:].replace("P_", "FY ") for year in fy]
+fy = ["FY " + year for year in paddy_prod.index]
 
 fig.add_trace(go.Scatter(x=fy, y=paddy_prod.values, name="Paddy", mode="lines+markers"))
 fig.add_trace(go.Scatter(x=fy, y=wheat_prod.values, name="Wheat", mode="lines+markers"))
@@ -0,0 +1,137 @@
+# coding: utf-8
+"""Reshaping of the wide district-level crop table.
+
+Every crop column is named ``XX_M_YYYYYY``: a crop code, a metric code and a
+fiscal year, e.g. PD_P_201213 is paddy production in FY 2012/13. The names
+are parsed once into a (crop, metric, fiscal_year) MultiIndex so any crop,
+metric or year can be picked out without scanning the column names again.
+"""
+
+import numpy as np
+import pandas as pd
+
+CROPS = {'PD': 'Paddy', 'WT': 'Wheat', 'MZ': 'Maize', 'ML': 'Millet', 'BL': 'Barley'}
+METRICS = {'P': 'Production', 'A': 'Area', 'Y': 'Yield'}
+
+_column_pattern = r'^(?P<crop>[A-Z]+)_(?P<metric>[PAY])_(?P<fiscal_year>\d{6})$'
+
+
+def parse_crop_columns(columns):
+    """(crop, metric, fiscal_year) MultiIndex for the crop columns in ``columns``.
+
+    Columns that don't follow the naming scheme (DISTRICT_NAME, ids...) are
+    dropped from the result.
+    """
+    parts = pd.Index(columns).str.extract(_column_pattern).dropna()
+    return pd.MultiIndex.from_frame(parts), parts.index
+
+
+def crop_cube(data, district_col='DISTRICT_NAME'):
+    """District x (crop, metric, fiscal_year) frame, sorted by crop, metric and year."""
+    index, positions = parse_crop_columns(data.columns)
+    cube = data.iloc[:, positions].copy()
+    cube.columns = index
+    cube.index = pd.Index(data[district_col], name=district_col)
+    if not cube.index.is_unique:
+        raise ValueError("{} has duplicate districts".format(district_col))
+    return cube.sort_index(axis=1)
+
+
+def crop_frame(cube, crop):
+    """One crop in the notebook's layout: DISTRICT_NAME plus its original columns."""
+    frame = cube[crop]
+    frame.columns = ['{}_{}_{}'.format(crop, metric, year) for metric, year in frame.columns]
+    return frame.reset_index()
+
+
+def district_series(cube, districts, crop=None, metric=None):
+    """Time series of a few districts, one column per district.
+
+    The rows are found through the cube's hashed DISTRICT_NAME index, so the
+    cost grows with the number of districts asked for, not the table size.
+    ``crop`` and ``metric`` narrow the rows of the result, which is indexed
+    by whatever is left of (crop, metric, fiscal_year).
+    """
+    if isinstance(districts, str):
+        districts = [districts]
+    rows = cube.index.get_indexer(districts)
+    if (rows < 0).any():
+        raise KeyError([d for d, row in zip(districts, rows) if row < 0])
+    series = cube.iloc[rows].T
+    if crop is not None:
+        series = series.xs(crop, level='crop')
+    if metric is not None:
+        series = series.xs(metric, level='metric')
+    return series
+
+
+def melt_crops(cube):
+    """Long district x crop x metric x fiscal_year table with one ``value`` column."""
+    n_districts, n_columns = cube.shape
+    long = cube.columns.to_frame(index=False)
+    long = long.iloc[np.tile(np.arange(n_columns), n_districts)].reset_index(drop=True)
+    long.insert(0, cube.index.name, np.repeat(cube.index.to_numpy(), n_columns))
+    long['value'] = cube.to_numpy(dtype=float).ravel()
+    return long
+
+
+def crop_array(cube):
+    """Dense district x crop x metric x fiscal_year array and its axis labels.
+
+    Missing (crop, metric, year) combinations are filled with NaN.
+    """
+    crops, metrics, years = (cube.columns.levels[i] for i in range(3))
+    full = pd.MultiIndex.from_product([crops, metrics, years], names=cube.columns.names)
+    values = cube.reindex(columns=full).to_numpy(dtype=float)
+    array = values.reshape(len(cube), len(crops), len(metrics), len(years))
+    return array, {'district': cube.index, 'crop': crops, 'metric': metrics, 'fiscal_year': years}
+
+
+def national_totals(cube):
+    """National totals for every crop, metric and fiscal year in one reduction.
+
+    Summing the cube over districts groups by all three column levels at
+    once. Returns a frame indexed by (crop, metric) with one column per
+    fiscal year, so ``totals.loc[('PD', 'P')]`` is the paddy production series.
+    """
+    return cube.sum().unstack('fiscal_year')
+
+
+def _select(values, n, largest):
+    """Row positions of the n largest (or smallest) values of every column, best first."""
+    n = min(n, len(values))
+    keyed = -values if largest else values
+    if n < len(values):
+        rows = np.argpartition(keyed, n - 1, axis=0)[:n]
+    else:
+        rows = np.broadcast_to(np.arange(len(values))[:, None], values.shape)
+    order = np.argsort(np.take_along_axis(keyed, rows, axis=0), axis=0, kind='stable')
+    return np.take_along_axis(rows, order, axis=0)
+
+
+def rank_districts(cube, n=10, metric='P', years=None):
+    """Top-n and bottom-n districts of every crop for one metric.
+
+    The metric is summed over the fiscal years in ``years`` (an inclusive
+    ``(first, last)`` pair such as ``('199091', '201314')``, all years by
+    default), then the n best and worst districts of every crop are picked
+    with a partial selection instead of a full sort. Returns two dicts of
+    crop -> Series indexed by district, both in descending order.
+    """
+    sub = cube.xs(metric, axis=1, level='metric')
+    if years is not None:
+        fiscal_years = sub.columns.get_level_values('fiscal_year')
+        sub = sub.loc[:, (fiscal_years >= years[0]) & (fiscal_years <= years[1])]
+    crops = sub.columns.get_level_values('crop')
+    # columns are sorted by crop, so each crop is one contiguous block of years
+    crop_names, starts = np.unique(crops, return_index=True)
+    values = np.nan_to_num(sub.to_numpy(dtype=float))
+    totals = np.add.reduceat(values, starts, axis=1)
+
+    top_rows = _select(totals, n, largest=True)
+    bottom_rows = _select(totals, n, largest=False)[::-1]
+    top, bottom = {}, {}
+    for i, crop in enumerate(crop_names):
+        for result, rows in ((top, top_rows), (bottom, bottom_rows)):
+            result[crop] = pd.Series(totals[rows[:, i], i], index=cube.index[rows[:, i]], name=metric)
+    return top, bottom
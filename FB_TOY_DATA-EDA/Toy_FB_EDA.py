@@ -10,9 +10,15 @@
 
 # Let's import necessary libraries
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+
+import sys
+sys.path.append('..')
+from edatools import fit_or_load, profile_file, profile_report, read_csv_cached
+from fb_pipeline import COLUMNS, column_range, partition_paths, read_partition, run_pipeline
+from fb_rollups import Rollup
+
 get_ipython().run_line_magic('matplotlib', 'inline')
 
 
@@ -28,25 +34,36 @@ matplotlib.rcParams['figure.figsize'] = (15.0, 6.0)
 # In[4]:
 
 
-fb = pd.read_csv('fb.csv')
+# The user table can also be a directory of partitions (csv, parquet or feather files) that is
+# processed out of core, one partition per worker process; the exploration cells then look at
+# the first partition only.
+PARTITIONS = None  # e.g. 'fb_partitions/'
+if PARTITIONS is None:
+    # the charts only need the columns the rollup counts; the profile covers them all
+    fb = read_csv_cached('fb.csv', columns=COLUMNS, schema='fb')
+    report = profile_file('fb.csv', schema='fb')
+else:
+    parts = partition_paths(PARTITIONS)
+    fb = read_partition(parts[0], COLUMNS)
+    report = profile_report(fb, name=parts[0])
 
 
 # In[5]:
 
 
-fb.head()
+report.head
 
 
 # In[6]:
 
 
-fb.tail()
+report.tail
 
 
 # In[7]:
 
 
-fb.shape
+report.shape
 
 
 # The dataset contains 15 columns that dedscribe about a certain account such as date of birth, gender, friend count, likes received, likes given, etc. 
@@ -54,13 +71,27 @@ fb.shape
 
 # ### Engineering Features
 
-# 1. Let's make a new column that contains groups for age and year of birth.
+# 1. Let's group the users by age and year of birth (10 equal-width groups each, like `pd.cut(bins=10)`).
+# The group edges are learnt on the first run and saved in `.bins/`, so they stay put when users are added and rollups of different loads can be merged; delete the files to learn them again.
+# Every chart below reads from one rollup that holds the user count and the sum and mean of each engagement metric per gender x age group x birth-year group, built in a single pass.
 
 # In[43]:
 
 
-fb['age_group'] = pd.cut(fb['age'], bins=10, precision=0)
-fb['dob_year_group'] = pd.cut(fb['dob_year'], bins=10, precision=0)
+if PARTITIONS is None:
+    age_values, dob_year_values = fb['age'], fb['dob_year']
+else:
+    # equal-width bins only need the overall range of each column; it is only
+    # scanned for when the bins aren't saved yet
+    age_values = lambda: column_range(parts, 'age')
+    dob_year_values = lambda: column_range(parts, 'dob_year')
+age_bins = fit_or_load('.bins/age.json', age_values, bins=10, precision=0)
+dob_year_bins = fit_or_load('.bins/dob_year.json', dob_year_values, bins=10, precision=0)
+
+if PARTITIONS is None:
+    rollup = Rollup(age_bins, dob_year_bins).add(fb)
+else:
+    rollup = run_pipeline(parts, age_bins, dob_year_bins)
 
 
 # # 2 - Visualization
@@ -70,7 +101,8 @@ fb['dob_year_group'] = pd.cut(fb['dob_year'], bins=10, precision=0)
 # In[23]:
 
 
-sns.countplot(x='gender', data=fb)
+gender_count = rollup.table('gender')
+sns.barplot(x=gender_count.index, y=gender_count.values)
 
 
 # The data contains more males and less females.
@@ -80,7 +112,7 @@ sns.countplot(x='gender', data=fb)
 # In[94]:
 
 
-gender_like_count = fb.groupby(['gender'])['likes_received'].sum().reset_index()
+gender_like_count = rollup.table('gender', metric='likes_received').reset_index()
 sns.barplot(x='gender', y='likes_received', data=gender_like_count)
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 
@@ -92,7 +124,7 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 # In[37]:
 
 
-sns.countplot(x='age_group', data=fb, hue='gender', color='blue')
+sns.barplot(x='age_group', y='count', data=rollup.table('age_group', 'gender'), hue='gender', color='blue')
 plt.title("No of users across different age groups")
 plt.show()
 
@@ -110,7 +142,8 @@ fb.columns
 # In[46]:
 
 
-sns.countplot(x='dob_year_group', data=fb, hue='gender', color='red')
+sns.barplot(x='dob_year_group', y='count', data=rollup.table('dob_year_group', 'gender'), hue='gender',
+            color='red')
 plt.title("No of users across different birth year groups")
 plt.xticks(rotation=45)
 plt.show()
@@ -121,7 +154,7 @@ plt.show()
 # In[63]:
 
 
-age_friends = fb.groupby(['age_group','gender'])['friend_count'].sum().reset_index()
+age_friends = rollup.table('age_group', 'gender', metric='friend_count')
 sns.barplot(x='age_group', y='friend_count', data=age_friends, hue='gender', palette='bright')
 plt.xticks(rotation=45)
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
@@ -132,7 +165,7 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 # In[66]:
 
 
-gender_initiation = fb.groupby(['gender'])['friendships_initiated'].sum().reset_index()
+gender_initiation = rollup.table('gender', metric='friendships_initiated').reset_index()
 sns.barplot(x='gender', y='friendships_initiated', data=gender_initiation)
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 
@@ -142,7 +175,7 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 # In[88]:
 
 
-device_likes = [fb['mobile_likes'].sum(), fb['www_likes'].sum()]
+device_likes = [rollup.total('mobile_likes'), rollup.total('www_likes')]
 device = ['Mobile', 'Web']
 plt.figure(figsize=(8,6))
 sns.barplot(x=device, y=device_likes)
@@ -155,7 +188,7 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 # In[97]:
 
 
-likes_given = fb.groupby(['gender'])['likes'].sum().reset_index()
+likes_given = rollup.table('gender', metric='likes').reset_index()
 sns.barplot(x='gender', y='likes', data=likes_given)
 plt.title("Comparison of likes given according to gender")
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
@@ -166,7 +199,7 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 # In[115]:
 
 
-age_tenure = fb.groupby(['age_group'])['tenure'].mean().reset_index()
+age_tenure = rollup.table('age_group', metric='tenure', stat='mean').reset_index()
 sns.barplot(y='age_group', x='tenure',data=age_tenure)
 plt.title("Average time spent on Facebook according to age group")
 plt.show()
@@ -0,0 +1,118 @@
+# coding: utf-8
+"""Out-of-core version of the notebook's engagement analysis.
+
+The user table is a directory (or glob, or list) of partitions: csv,
+parquet or feather files with the columns of ``fb.csv``. Each partition is
+read on its own in a worker process, only the columns the analysis needs,
+and reduced to a ``Rollup`` of counts and sums; the partial rollups are
+then merged. Memory is bounded by the largest partition and the run time
+grows linearly with the number of partitions.
+
+The bins must be the same for every partition. Saved ``Binner`` objects
+can be passed in; ``column_range`` finds the overall range of a column
+(one small read per partition), which is all equal-width bins need.
+
+    python fb_pipeline.py fb_partitions/ --processes 8
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+if __name__ == '__main__':
+    # run as a script: edatools is one folder up
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from edatools.binning import Binner
+from edatools.parallel import expand_paths, parallel_map
+from fb_rollups import METRICS, Rollup
+
+COLUMNS = ['gender', 'age', 'dob_year'] + METRICS
+_READERS = {'.csv': lambda path, columns: pd.read_csv(path, usecols=columns),
+            '.parquet': lambda path, columns: pd.read_parquet(path, columns=columns),
+            '.feather': lambda path, columns: pd.read_feather(path, columns=columns)}
+
+
+def partition_paths(source):
+    """Partition files of a directory, a glob pattern or a list, in name order."""
+    return expand_paths(source, extensions=_READERS, what='csv, parquet or feather partitions')
+
+
+def read_partition(path, columns=None):
+    """One partition, optionally only some of its columns."""
+    return _READERS[os.path.splitext(path)[1]](path, columns)
+
+
+def write_partitions(fb, directory, rows=100000, fmt='csv'):
+    """Split a user frame into partitions of ``rows`` rows; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, start in enumerate(range(0, len(fb), rows)):
+        path = os.path.join(directory, 'part-{:05d}.{}'.format(i, fmt))
+        part = fb.iloc[start:start + rows].reset_index(drop=True)
+        if fmt == 'csv':
+            part.to_csv(path, index=False)
+        else:
+            getattr(part, 'to_' + fmt)(path)
+        paths.append(path)
+    return paths
+
+
+def _range(path, column):
+    values = read_partition(path, [column])[column].to_numpy(dtype=float)
+    return np.nanmin(values), np.nanmax(values)
+
+
+def column_range(paths, column, processes=None):
+    """Overall (min, max) of a column across the partitions."""
+    ranges = np.array(parallel_map(_range, [(path, column) for path in paths], processes))
+    return np.array([np.nanmin(ranges[:, 0]), np.nanmax(ranges[:, 1])])
+
+
+def _rollup_partition(path, age_bins, dob_year_bins):
+    return Rollup(age_bins, dob_year_bins).add(read_partition(path, COLUMNS))
+
+
+def run_pipeline(source, age_bins=None, dob_year_bins=None, bins=10, processes=None):
+    """Merged ``Rollup`` of every partition, built in worker processes.
+
+    Bins that aren't given are learnt as ``bins`` equal-width bins over the
+    whole table, the same ones ``pd.cut(..., bins=bins)`` picks in memory.
+    """
+    paths = partition_paths(source)
+    if age_bins is None:
+        age_bins = Binner.equal_width(column_range(paths, 'age', processes), bins)
+    if dob_year_bins is None:
+        dob_year_bins = Binner.equal_width(column_range(paths, 'dob_year', processes), bins)
+    partials = parallel_map(_rollup_partition, [(path, age_bins, dob_year_bins) for path in paths], processes)
+    rollup = partials[0]
+    for partial in partials[1:]:
+        rollup.merge(partial)
+    return rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Facebook engagement rollups over partitioned user files.")
+    parser.add_argument('source', help='directory, glob or file of csv/parquet/feather partitions')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--bins', type=int, default=10)
+    args = parser.parse_args()
+
+    rollup = run_pipeline(args.source, bins=args.bins, processes=args.processes)
+    print(rollup.table('gender').to_string())
+    for metric in ('likes_received', 'friendships_initiated', 'likes'):
+        print()
+        print(rollup.table('gender', metric=metric).to_string())
+    print()
+    print(rollup.table('age_group', 'gender', metric='friend_count').to_string(index=False))
+    print()
+    print(rollup.table('age_group', metric='tenure', stat='mean').to_string())
+    print()
+    print("mobile likes: {:,.0f}  web likes: {:,.0f}".format(rollup.total('mobile_likes'),
+                                                             rollup.total('www_likes')))
+
+
+if __name__ == '__main__':
+    main()
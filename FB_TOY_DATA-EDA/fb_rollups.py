@@ -0,0 +1,129 @@
+# coding: utf-8
+"""Engagement rollups of the Facebook user table.
+
+Every chart in the notebook is a count, sum or mean of a user metric by
+gender, age group and/or birth-year group. ``Rollup`` computes all of
+them in one pass: each user gets an integer cell code from its gender
+code and the bins of its age and birth year, and one ``bincount`` per
+metric fills the sums and non-null counts of every (gender, age bin,
+dob-year bin) cell. The charts then sum the small cube over the axes they
+don't need.
+
+The bins are ``edatools.binning.Binner`` objects, learnt once and saved,
+so they don't move when users are added; cubes built with the same bins
+add up, and rollups of separate batches or days can be merged.
+"""
+
+import numpy as np
+import pandas as pd
+
+from edatools.binning import Binner
+
+METRICS = ['likes_received', 'friend_count', 'friendships_initiated', 'likes', 'tenure',
+           'mobile_likes', 'www_likes']
+GENDERS = ['female', 'male']
+
+
+class Rollup:
+    """Row counts, metric sums and metric non-null counts per gender x age bin x dob-year bin.
+
+    Each axis has one extra slot at the end for rows whose gender is
+    missing or whose age/birth year falls outside the edges; the tables
+    leave those rows out of the axes they show, like a groupby would, but
+    keep them in the totals of the axes summed over.
+    """
+
+    dims = ('gender', 'age_group', 'dob_year_group')
+
+    def __init__(self, age_bins, dob_bins, genders=GENDERS, metrics=METRICS):
+        self.bins = {'age_group': age_bins, 'dob_year_group': dob_bins}
+        self.genders = list(genders)
+        self.metrics = list(metrics)
+        self.shape = (len(self.genders) + 1, age_bins.bins + 1, dob_bins.bins + 1)
+        self.rows = np.zeros(self.shape, dtype=np.int64)
+        self.sums = {metric: np.zeros(self.shape) for metric in self.metrics}
+        self.counts = {metric: np.zeros(self.shape, dtype=np.int64) for metric in self.metrics}
+
+    @classmethod
+    def from_frame(cls, fb, bins=10, **kwargs):
+        """Rollup of a frame with bins learnt from it, matching ``pd.cut(..., bins=10, precision=0)``."""
+        rollup = cls(Binner.equal_width(fb['age'], bins), Binner.equal_width(fb['dob_year'], bins), **kwargs)
+        return rollup.add(fb)
+
+    def _cells(self, fb):
+        gender = pd.Categorical(fb['gender'], categories=self.genders).codes.astype(np.int64)
+        codes = [gender, self.bins['age_group'].codes(fb['age']),
+                 self.bins['dob_year_group'].codes(fb['dob_year'])]
+        # -1 (missing / out of range) goes to each axis' last slot
+        codes = [np.where(code < 0, size - 1, code) for code, size in zip(codes, self.shape)]
+        return np.ravel_multi_index(codes, self.shape)
+
+    def add(self, fb):
+        """Fold a batch of user rows into the cube."""
+        cells = self._cells(fb)
+        size = int(np.prod(self.shape))
+        self.rows += np.bincount(cells, minlength=size).reshape(self.shape)
+        for metric in self.metrics:
+            values = fb[metric].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            self.sums[metric] += np.bincount(cells[valid], weights=values[valid],
+                                             minlength=size).reshape(self.shape)
+            self.counts[metric] += np.bincount(cells[valid], minlength=size).reshape(self.shape)
+        return self
+
+    def merge(self, other):
+        """Add another rollup built with the same bins, genders and metrics."""
+        if not (self.bins == other.bins and self.genders == other.genders and self.metrics == other.metrics):
+            raise ValueError("can only merge rollups with the same bins")
+        self.rows += other.rows
+        for metric in self.metrics:
+            self.sums[metric] += other.sums[metric]
+            self.counts[metric] += other.counts[metric]
+        return self
+
+    def _labels(self, dim):
+        if dim == 'gender':
+            return pd.Index(self.genders, name=dim)
+        labels = self.bins[dim].labels
+        # an ordered categorical of intervals, like the column pd.cut makes
+        return pd.CategoricalIndex(labels, categories=labels, ordered=True, name=dim)
+
+    def _reduce(self, cube, keep):
+        summed = tuple(i for i, dim in enumerate(self.dims) if dim not in keep)
+        cube = cube.sum(axis=summed)
+        # drop the missing/out-of-range slot of the axes that are shown
+        return cube[tuple(slice(0, -1) for _ in keep)]
+
+    def table(self, *keep, metric=None, stat='sum'):
+        """``stat`` ('sum', 'mean' or 'count') of ``metric`` by the ``keep`` axes.
+
+        Without a metric it gives the number of users. One axis gives a
+        Series; two give a long frame with a column per axis, ready for a
+        ``hue`` barplot, like ``groupby(list(keep)).agg().reset_index()``.
+        """
+        if metric is None:
+            values = self._reduce(self.rows, keep)
+            name = 'count'
+        elif stat == 'sum':
+            values, name = self._reduce(self.sums[metric], keep), metric
+        elif stat == 'count':
+            values, name = self._reduce(self.counts[metric], keep), metric
+        elif stat == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = self._reduce(self.sums[metric], keep) / self._reduce(self.counts[metric], keep)
+            name = metric
+        else:
+            raise ValueError("stat must be 'sum', 'mean' or 'count'")
+        # the reduced axes are in cube order; put them in the order asked for
+        order = [dim for dim in self.dims if dim in keep]
+        values = np.transpose(values, [order.index(dim) for dim in keep])
+        index = pd.MultiIndex.from_product([self._labels(dim) for dim in keep])
+        series = pd.Series(values.ravel(), index=index, name=name)
+        if len(keep) == 1:
+            series.index = self._labels(keep[0])
+            return series
+        return series.reset_index()
+
+    def total(self, metric):
+        """Sum of a metric over every user, including ones outside the bins."""
+        return self.sums[metric].sum()
@@ -13,6 +13,12 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+
+import sys
+sys.path.append('..')
+from edatools import profile_file, read_csv_cached
+from olympics import CountryDictionary, Leaderboard, MedalCube, country_names, normalize_names, resolve_countries
+
 plt.style.use('fivethirtyeight')
 import plotly.offline as py
 py.init_notebook_mode(connected=True)
@@ -27,31 +33,40 @@ import plotly.tools as tls
 # In[185]:
 
 
-summer = pd.read_csv('/home/rupakkarki/Desktop/EDA-PROJECTS/OLYMPICS/data/summer.csv')
+summer = read_csv_cached('data/summer.csv', schema='olympics')
+report = profile_file('data/summer.csv', schema='olympics')
 
 
 # In[128]:
 
 
-countries = pd.read_csv('/home/rupakkarki/Desktop/EDA-PROJECTS/OLYMPICS/data/dictionary.csv')
+# IOC code -> country name lookup, saved as integer codes and rebuilt only when dictionary.csv changes
+countries = CountryDictionary.load_or_build('data/dictionary.csv')
+
+
+# In[129]:
+
+
+# winter games, same layout as the summer file
+winter = read_csv_cached('data/winter.csv', schema='olympics')
 
 
 # In[5]:
 
 
-summer.shape
+report.shape
 
 
 # In[6]:
 
 
-summer.head()
+report.head
 
 
 # In[7]:
 
 
-summer.tail()
+report.tail
 
 
 # This dataset contains the record of olympic medals from 1896 to 2012. There are 31165 rows and 9 columns that have data about the year of olypic, City, Sport, Discipline, Athlete Name, Country, Gender, Event and The medal they obtained.
@@ -59,13 +74,13 @@ summer.tail()
 # In[8]:
 
 
-summer.info()
+print(report.info())
 
 
 # In[9]:
 
 
-summer.isnull().sum()
+report.columns['nulls']
 
 
 # No missing values, that's great for us!
@@ -75,25 +90,43 @@ summer.isnull().sum()
 # In[186]:
 
 
-# Cleanup the Athlete name
-summer['Athlete'] = summer['Athlete'].str.split(', ').str[::-1].str.join(' ')
-summer['Athlete'] = summer['Athlete'].str.title()
+# Cleanup the Athlete name ('HAJOS, Alfred' -> 'Alfred Hajos'), only the distinct names are rewritten
+summer['Athlete'] = normalize_names(summer['Athlete'])
+winter['Athlete'] = normalize_names(winter['Athlete'])
 summer.head(1)
 
 
+# In[100]:
+
+
+# Medal counts of both games in one Season x Year x Country x Discipline x Gender x Medal cube.
+# Country is the IOC code here; the charts below are all slices and sums of this cube.
+cube = MedalCube.from_frames(Summer=summer, Winter=winter)
+
+
 # In[115]:
 
 
-countries.head()
+countries.frame().head()
 
 
 # In[187]:
 
 
-summer=summer.merge(countries,left_on='Country',right_on='Code',how='left')
-summer = summer[['Year','City','Sport','Discipline','Athlete','Country_x','Gender','Event','Medal','Country_y']]
-summer = summer.rename({'Country_x':'Code',
-                       'Country_y':'Country'}, axis=1)
+# the Country column holds IOC codes; look up their names in the dictionary instead of merging
+summer_names, summer_unmatched = resolve_countries(summer['Country'], countries)
+winter_names, winter_unmatched = resolve_countries(winter['Country'], countries)
+summer = summer.rename(columns={'Country': 'Code'})
+summer['Country'] = summer_names
+winter = winter.rename(columns={'Country': 'Code'})
+winter['Country'] = winter_names
+
+
+# In[190]:
+
+
+# historical codes that are not in the dictionary (URS, GDR, EUA...)
+summer_unmatched
 
 
 # In[188]:
@@ -107,35 +140,35 @@ summer.head()
 # In[189]:
 
 
-male_most_medals = summer[summer['Gender'] == 'Men']['Athlete'].value_counts()[:1].index[0]
+# top 10 athletes for every (gender, medal, sport) in one pass, with the country of each athlete;
+# new games can be added later with leaderboard.add(...) without recounting
+leaderboard = Leaderboard(k=10).add(summer)
+
+male_most_medals = leaderboard.top(1, gender='Men').iloc[0]
 print("The Male player with the most medals is {} of {}.".format(
-    male_most_medals, 
-    summer[summer['Athlete'] == male_most_medals]['Country'].values[0]))
-print("No.of Medals: {}".format(
-    summer[summer['Gender'] == 'Men']['Athlete'].value_counts()[:1].values[0]))
+    male_most_medals['Athlete'], male_most_medals['Country']))
+print("No.of Medals: {}".format(male_most_medals['Medals']))
 
 
 # In[191]:
 
 
-female_most_medals = summer[summer['Gender'] == 'Women']['Athlete'].value_counts()[:1].index[0]
-print("The Male player with the most medals is {} of {}.".format(
-    female_most_medals, 
-    summer[summer['Athlete'] == female_most_medals]['Code'].values[0]))
-print("No.of Medals: {}".format(
-    summer[summer['Gender'] == 'Women']['Athlete'].value_counts()[:1].values[0]))
+female_most_medals = leaderboard.top(1, gender='Women').iloc[0]
+print("The Female player with the most medals is {} of {}.".format(
+    female_most_medals['Athlete'], female_most_medals['Country']))
+print("No.of Medals: {}".format(female_most_medals['Medals']))
 
 
-# Had to use the Country Code for female player because URS has now been renamed RUS for RUSSIA.
+# The leaderboard falls back to the Country Code for the female player because URS has now been renamed RUS for RUSSIA.
 
 # ### Athletes with highest number of medals according to medal type
 
 # In[210]:
 
 
-medal_types = summer.groupby(by=['Athlete', 'Medal'])['Sport'].count().reset_index().sort_values(
-    ascending=False, by='Sport')
-medal_types = medal_types.drop_duplicates(subset='Medal', keep='first')
+medal_types = pd.concat([leaderboard.top(1, medal=medal).assign(Medal=medal)
+                         for medal in ['Gold', 'Silver', 'Bronze']], ignore_index=True)
+medal_types = medal_types[['Athlete', 'Medal', 'Medals']]
 medal_types.columns = [['Athlete', 'Medal Type', 'Count']]
 medal_types
 
@@ -145,7 +178,10 @@ medal_types
 # In[211]:
 
 
-medal_country = summer.groupby(['Country', 'Code'])['Medal'].count().reset_index()
+medal_country = cube.total('Country', Season='Summer').rename('Medal')
+medal_country = medal_country[medal_country > 0].rename_axis('Code').reset_index()
+medal_country['Country'] = medal_country['Code'].map(countries.mapping())
+medal_country = medal_country.dropna(subset=['Country'])
 
 
 # In[214]:
@@ -181,10 +217,10 @@ fig.show()
 # In[252]:
 
 
-top_ten = summer.groupby(['Country','Medal'])['Gender'].count().reset_index().sort_values(
-    by='Gender', ascending=False)
-top_ten = top_ten.pivot('Country', 'Medal', 'Gender').fillna(0)
-top_ten = top_ten.sort_values(ascending=False, by='Gold')[:11]
+# Country x Medal counts of the summer games
+medal_table = country_names(cube.total('Country', 'Medal', Season='Summer'), countries)
+medal_table = medal_table[medal_table.sum(axis=1) > 0]
+top_ten = medal_table.sort_values(ascending=False, by='Gold')[:11]
 top_ten.plot.barh(width=0.8)
 fig = plt.gcf()
 fig.set_size_inches(9,9)
@@ -197,10 +233,7 @@ plt.show()
 # In[253]:
 
 
-low_ten = summer.groupby(['Country','Medal'])['Gender'].count().reset_index().sort_values(
-    by='Gender',ascending=False)
-low_ten = low_ten.pivot('Country','Medal','Gender').fillna(0)
-low_ten = low_ten.sort_values(by='Gold',ascending=True)[:11]
+low_ten = medal_table.sort_values(by='Gold',ascending=True)[:11]
 low_ten.plot.barh(width=0.8)
 fig = plt.gcf()
 fig.set_size_inches(9,9)
@@ -213,10 +246,11 @@ plt.show()
 # In[270]:
 
 
-test=summer[summer['Country'].isin(summer['Country'].value_counts()[:11].index)]
-test=test[test['Discipline'].isin(summer['Discipline'].value_counts()[:11].index)]
-test=test.groupby(['Country','Discipline'])['Sport'].count().reset_index()
-test=test.pivot('Discipline','Country','Sport')
+by_country = country_names(cube.total('Country', Season='Summer'), countries)
+by_discipline = cube.total('Discipline', Season='Summer')
+test = country_names(cube.total('Discipline', 'Country', Season='Summer'), countries, axis=1)
+test = test.loc[by_discipline.nlargest(11).index, by_country.nlargest(11).index]
+test = test.sort_index().sort_index(axis=1).replace(0, np.nan)
 sns.heatmap(test, annot=True, fmt='2.0f')
 fig=plt.gcf()
 fig.set_size_inches(8,6)
@@ -226,9 +260,8 @@ plt.show()
 # In[273]:
 
 
-medals_year = summer.groupby(['Country','Year'])['Medal'].count().reset_index()
-medals_year = medals_year[medals_year['Country'].isin(summer['Country'].value_counts()[:5].index)]
-medals_year = medals_year.pivot('Year','Country','Medal')
+medals_year = country_names(cube.total('Year', 'Country', Season='Summer'), countries, axis=1)
+medals_year = medals_year[by_country.nlargest(5).index].replace(0, np.nan).dropna(how='all')
 medals_year.plot()
 fig=plt.gcf()
 fig.set_size_inches(18,8)
@@ -0,0 +1,243 @@
+# coding: utf-8
+"""Helpers for the Olympic medal data in ``data/``."""
+
+import heapq
+import itertools
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from edatools.cache import cache_path, remove_stale
+
+
+def normalize_names(names):
+    """'HAJOS, Alfred' -> 'Alfred Hajos' for a whole column of athlete names.
+
+    The same athletes show up in many medal rows, so the names are factorized
+    and only the distinct ones are rewritten before mapping back by code.
+    """
+    codes, uniques = pd.factorize(names)
+    uniques = pd.Series(uniques, dtype=object)
+    cleaned = uniques.str.split(', ').str[::-1].str.join(' ').str.title()
+    values = np.append(cleaned.to_numpy(dtype=object), np.nan)
+    # code -1 (missing name) picks the trailing NaN
+    return pd.Series(values[codes], index=names.index, name=names.name)
+
+
+class MedalCube:
+    """Medal counts over Season x Year x Country x Discipline x Gender x Medal.
+
+    The counts are kept in one dense numpy array and every axis is
+    dictionary-encoded (``axes[name]`` holds the labels in code order), so
+    the leaderboards and charts are slices and sums of the array instead of
+    fresh groupbys over the medal rows. Country is the IOC code.
+    """
+
+    dims = ('Season', 'Year', 'Country', 'Discipline', 'Gender', 'Medal')
+
+    def __init__(self, counts, axes):
+        self.counts = counts
+        self.axes = axes
+
+    @classmethod
+    def from_frames(cls, **seasons):
+        """Build the cube from raw medal frames, e.g. ``from_frames(Summer=summer, Winter=winter)``."""
+        medals = pd.concat([df.assign(Season=season) for season, df in seasons.items()],
+                           ignore_index=True)
+        codes, axes = [], {}
+        for dim in cls.dims:
+            dim_codes, labels = pd.factorize(medals[dim].astype(object), sort=True)
+            codes.append(dim_codes)
+            axes[dim] = pd.Index(labels, name=dim)
+        # rows with a missing label (a few summer medals have no country) are left out,
+        # like a groupby would
+        codes = np.array(codes)
+        codes = codes[:, (codes >= 0).all(axis=0)]
+        shape = tuple(len(axes[dim]) for dim in cls.dims)
+        flat = np.ravel_multi_index(codes, shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape).astype(np.int32)
+        return cls(counts, axes)
+
+    def total(self, *keep, **select):
+        """Medal counts summed over every axis not in ``keep``.
+
+        ``select`` restricts an axis to one label or a list of labels first,
+        e.g. ``total('Country', 'Medal', Season='Summer')``. One kept axis
+        gives a Series, two give a DataFrame (first axis down the rows) and
+        more give a Series with a MultiIndex.
+        """
+        counts, axes = self.counts, dict(self.axes)
+        for dim, labels in select.items():
+            i = self.dims.index(dim)
+            positions = axes[dim].get_indexer(np.atleast_1d(labels))
+            if (positions < 0).any():
+                raise KeyError(labels)
+            counts = np.take(counts, positions, axis=i)
+            axes[dim] = axes[dim][positions]
+        summed = tuple(i for i, dim in enumerate(self.dims) if dim not in keep)
+        counts = counts.sum(axis=summed)
+        # the remaining axes are in cube order; put them in the order asked for
+        remaining = [dim for dim in self.dims if dim in keep]
+        counts = np.transpose(counts, [remaining.index(dim) for dim in keep])
+        if len(keep) == 1:
+            return pd.Series(counts, index=axes[keep[0]], name='Medals')
+        if len(keep) == 2:
+            return pd.DataFrame(counts, index=axes[keep[0]], columns=axes[keep[1]])
+        index = pd.MultiIndex.from_product([axes[dim] for dim in keep])
+        return pd.Series(counts.ravel(), index=index, name='Medals')
+
+
+class CountryDictionary:
+    """IOC code -> country name lookup, integer-coded and saved to json.
+
+    ``codes`` is the dictionary's IOC codes and ``name_codes`` the position
+    of each one's name in ``names``, so resolving a column of codes is a
+    hash lookup of its distinct codes and one ``take``.
+    """
+
+    def __init__(self, codes, names, name_codes):
+        self.codes = pd.Index(codes, name='Code')
+        self.names = pd.Index(names, name='Country')
+        self.name_codes = np.asarray(name_codes, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, countries):
+        """Build from a frame with ``Code`` and ``Country`` columns, like ``dictionary.csv``."""
+        name_codes, names = pd.factorize(countries['Country'], sort=True)
+        return cls(countries['Code'], names, name_codes)
+
+    @classmethod
+    def load_or_build(cls, csv_path, cache_dir=None):
+        """The dictionary of ``csv_path``, built once per version of the file.
+
+        It is saved next to the file's Feather cache under the same
+        fingerprint (path, mtime and size), so an edited ``dictionary.csv``
+        is picked up and the copies for older versions are removed.
+        """
+        target = cache_path(csv_path, cache_dir).rsplit('.', 1)[0] + '.countries.json'
+        if os.path.exists(target):
+            return cls.load(target)
+        dictionary = cls.from_frame(pd.read_csv(csv_path, usecols=['Code', 'Country']))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        remove_stale(target, '.countries.json')
+        dictionary.save(target)
+        return dictionary
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'codes': self.codes.tolist(), 'names': self.names.tolist(),
+                       'name_codes': self.name_codes.tolist()}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            stored = json.load(f)
+        return cls(stored['codes'], stored['names'], stored['name_codes'])
+
+    def mapping(self):
+        """Country name per IOC code, as a Series indexed by code."""
+        return pd.Series(self.names.take(self.name_codes), index=self.codes, name='Country')
+
+    def frame(self):
+        """The dictionary as a Country/Code frame, like ``dictionary.csv``."""
+        return self.mapping().reset_index()[['Country', 'Code']]
+
+
+def country_names(table, countries, axis=0):
+    """Swap IOC codes for country names, dropping codes missing from the dictionary.
+
+    This matches what the left merge with ``dictionary.csv`` followed by a
+    groupby on the country name used to give.
+    """
+    names = countries.mapping()
+    labels = table.index if axis == 0 else table.columns
+    table = table.loc[labels.isin(names.index)] if axis == 0 else table.loc[:, labels.isin(names.index)]
+    return table.rename(index=names) if axis == 0 else table.rename(columns=names)
+
+
+def resolve_countries(codes, countries):
+    """Country names for a column of IOC codes, without merging frames.
+
+    ``countries`` is a ``CountryDictionary``. The distinct codes are looked
+    up once in it and the result is a categorical over the dictionary's
+    names, built with a single take on the factorized codes. Codes the
+    dictionary doesn't know (URS, GDR, EUA...) come back as NaN and are
+    listed with their row counts in the second return value.
+    """
+    row_codes, uniques = pd.factorize(codes)
+    positions = countries.codes.get_indexer(uniques)
+    # -1 (unknown code or missing value) stays -1, which Categorical.from_codes reads as missing
+    name_codes = np.append(np.where(positions >= 0, countries.name_codes[positions], -1), -1)[row_codes]
+    names = pd.Series(pd.Categorical.from_codes(name_codes, countries.names),
+                      index=codes.index, name='Country')
+
+    counts = np.bincount(row_codes[row_codes >= 0], minlength=len(uniques))
+    unmatched = pd.DataFrame({'Code': np.asarray(uniques)[positions < 0],
+                              'Rows': counts[positions < 0]})
+    return names, unmatched.sort_values('Rows', ascending=False, ignore_index=True)
+
+
+class Leaderboard:
+    """Most decorated athletes for every (gender, medal, sport), kept incrementally.
+
+    Each key, including the ones with a wildcard (``None``) such as "all men,
+    any medal, any sport", holds a bounded top-k list. Medal counts only ever
+    go up, so when a batch of results is added the new top-k of a key can
+    only come from its old top-k plus the athletes in the batch; nothing
+    has to be recounted. The first country seen for each athlete is kept for
+    attribution.
+    """
+
+    dims = ('Gender', 'Medal', 'Sport')
+
+    def __init__(self, k=10):
+        self.k = k
+        self._counts = defaultdict(dict)
+        self._top = {}
+        self.country = {}
+
+    def add(self, medals):
+        """Add medal rows (Athlete, Gender, Medal, Sport, Code and Country columns)."""
+        medals = medals.dropna(subset=['Athlete'])
+        base = medals.groupby(list(self.dims) + ['Athlete'], observed=True).size()
+        base = base[base > 0]
+        for kept in itertools.product((True, False), repeat=len(self.dims)):
+            levels = [dim for dim, keep in zip(self.dims, kept) if keep] + ['Athlete']
+            batch = base.groupby(level=levels).sum()
+            labels = [batch.index.get_level_values(dim).to_numpy(dtype=object) if keep
+                      else itertools.repeat(None) for dim, keep in zip(self.dims, kept)]
+            athletes = batch.index.get_level_values('Athlete').to_numpy(dtype=object)
+            updated = defaultdict(list)
+            for key, athlete, medal_count in zip(zip(*labels), athletes, batch.to_numpy().tolist()):
+                counts = self._counts[key]
+                counts[athlete] = counts.get(athlete, 0) + medal_count
+                updated[key].append(athlete)
+            for key, athletes in updated.items():
+                candidates = {athlete for _, athlete in self._top.get(key, [])}
+                candidates.update(athletes)
+                counts = self._counts[key]
+                # most medals first, ties broken alphabetically
+                best = heapq.nsmallest(self.k, candidates, key=lambda athlete: (-counts[athlete], athlete))
+                self._top[key] = [(counts[athlete], athlete) for athlete in best]
+
+        firsts = medals.drop_duplicates('Athlete')
+        for athlete, code, name in zip(firsts['Athlete'], firsts['Code'], firsts['Country']):
+            # fall back to the IOC code for countries the dictionary doesn't know
+            self.country.setdefault(athlete, code if pd.isna(name) else name)
+        return self
+
+    def top(self, k=1, gender=None, medal=None, sport=None):
+        """The k athletes with the most medals, ``None`` meaning any value."""
+        if k > self.k:
+            raise ValueError("the leaderboard only keeps the top {}".format(self.k))
+        entries = self._top.get((gender, medal, sport), [])[:k]
+        return pd.DataFrame({'Athlete': [athlete for _, athlete in entries],
+                             'Country': [self.country[athlete] for _, athlete in entries],
+                             'Medals': [count for count, _ in entries]})
+
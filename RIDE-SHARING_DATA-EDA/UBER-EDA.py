@@ -10,10 +10,18 @@
 
 
 # import necessary libraries
+import glob
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+
+import sys
+sys.path.append('..')
+from edatools import GridIndex, profile_report, read_csv_cached
+from uber_counts import (TRIP_SCHEMAS, add_calendar_features, count_pickup_files, counts_from_frame,
+                         count_table, date_column, month_dow_table, parse_pickup_dates)
+
 get_ipython().run_line_magic('matplotlib', 'inline')
 
 
@@ -28,7 +36,39 @@ matplotlib.rcParams['figure.figsize'] = (15.0, 6.0)
 
 
 # Loading te dataset
-uber = pd.read_csv('/home/rupakkarki/Desktop/datasets/uber-data/ride_data/uber-raw-data-janjune-15.csv')
+# a single raw file or a glob of them (one file per month/base), e.g. 'ride_data/uber-raw-data-*.csv'
+path = '/home/rupakkarki/Desktop/datasets/uber-data/ride_data/uber-raw-data-janjune-15.csv'
+files = sorted(glob.glob(path))
+
+# In streaming mode the files are read in chunks, one per worker process, and only the
+# pickup count tables are kept, so memory stays flat however big the data grows.
+# The exploration cells then work on a sample of the first file.
+STREAMING = True
+
+
+def load_trips(f):
+    # the 2015 files call the pickup date Pickup_date and the 2014 ones Date/Time,
+    # each with its own layout and base columns; both become a parsed Date column
+    date_col = date_column(f)
+    # only the pickup date, and the 2014 pickup coordinates, are used below
+    columns = [date_col, 'Lat', 'Lon'] if date_col == 'Date/Time' else [date_col]
+    if STREAMING:
+        trips = pd.read_csv(f, usecols=columns, nrows=100000)
+    else:
+        trips = read_csv_cached(f, columns=columns, schema=TRIP_SCHEMAS[date_col])
+    trips = trips.rename(columns={date_col: 'Date'})
+    trips['Date'] = parse_pickup_dates(trips['Date'])
+    return trips
+
+
+if STREAMING:
+    counts = count_pickup_files(files)
+    uber = load_trips(files[0])
+else:
+    uber = pd.concat([load_trips(f) for f in files], ignore_index=True)
+
+# shape, head/tail, nulls, distinct values and dtypes in one pass over the columns
+report = profile_report(uber)
 
 
 # ## 1 - Data Exploration
@@ -36,22 +76,29 @@ uber = pd.read_csv('/home/rupakkarki/Desktop/datasets/uber-data/ride_data/uber-r
 # In[4]:
 
 
-uber.shape
+# In streaming mode `uber` is only a sample; the counts cover every row of every file
+if STREAMING:
+    print("{:,} pickups in {} file(s)".format(counts['total'], len(files)))
+else:
+    print(report.shape)
 
 
 # This dataset is huge, the original csv file is over 500MB and we can see that there is data for more than 14 million uber pickups in just 6 months in NewYork alone.
 
+# The head, tail, null and unique-value cells below look at `uber`, which in streaming mode is a sample of the first file.
+
 # In[5]:
 
 
-# Explore Head
-uber.head()
+# Explore Head (sample only when streaming)
+report.head
 
 
 # In[6]:
 
 
-uber.tail()
+# sample only when streaming
+report.tail
 
 
 # #### Let's check for null values.
@@ -59,55 +106,33 @@ uber.tail()
 # In[7]:
 
 
-uber.isnull().sum()
+# nulls in the sample only when streaming
+report.columns['nulls']
 
 
 # In[8]:
 
 
-# Unique values
-uber.nunique()
+# Unique values (of the sample only when streaming)
+report.columns['unique']
 
 
 # In[9]:
 
 
-uber.dtypes
+report.dtypes
 
 
-# There are no missing values for the pickup date columns and that's preety much what we need for this dataset. We have to perform any data preprocessing for the pickup date column.
+# There are no missing values for the pickup date columns and that's preety much what we need for this dataset. The pickup date column was renamed to Date and converted to datetime when the files were loaded.
 
 # #### Making separate columns for month, day and hour
 
-# In[10]:
-
-
-# rename pickup date to Date
-uber.rename(columns={'Pickup_date': 'Date'}, inplace=True)
-
-
-# In[11]:
-
-
-# convert to datetime field.
-uber['Date'] = pd.to_datetime(uber['Date'])
-
-
-# In[12]:
-
-
-uber.dtypes
-
-
-# The date column is converted to datetime
-
 # In[13]:
 
 
-# Let's extract the month, day and hour
-uber['month'] = uber['Date'].dt.month
-uber['day'] = uber['Date'].dt.day
-uber['hour'] = uber['Date'].dt.hour
+# Let's extract the month, day, hour and weekday in one pass.
+# month/day/hour are int8 and month_name/DayOfWeek are categoricals.
+add_calendar_features(uber, date_col='Date')
 
 
 # In[14]:
@@ -117,13 +142,13 @@ uber['hour'] = uber['Date'].dt.hour
 uber.head()
 
 
-# Let's map the month to its name 
-
-# In[15]:
+# In[16]:
 
 
-month_names = {1: 'January',2: 'February',3: 'March',4: 'April',5: 'May',6: 'June'}
-uber['month_name'] = uber['month'].map(month_names)
+# Without streaming, build the count tables from the frame in memory.
+# Every plot below draws from these tables instead of the raw trips.
+if not STREAMING:
+    counts = counts_from_frame(uber, date_col='Date')
 
 
 # ## 2 - Data Visualization and Analysis
@@ -135,7 +160,8 @@ uber['month_name'] = uber['month'].map(month_names)
 # In[34]:
 
 
-ax = sns.countplot(x='month', data=uber)
+month_counts = count_table(counts, 'month')
+ax = sns.barplot(x=month_counts.index, y=month_counts.values)
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 plt.title("Number of Pickups each month from Jan - Jun 2015")
 for p in ax.patches:
@@ -149,7 +175,8 @@ for p in ax.patches:
 # In[35]:
 
 
-ax = sns.countplot(x='day', data=uber)
+day_counts = count_table(counts, 'day')
+ax = sns.barplot(x=day_counts.index, y=day_counts.values)
 plt.title("No. of pickups each day of the month")
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 
@@ -161,30 +188,19 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 # In[36]:
 
 
-sns.countplot(x='hour', data=uber)
+hour_counts = count_table(counts, 'hour')
+sns.barplot(x=hour_counts.index, y=hour_counts.values)
 plt.title("No. of pickups across different hours of the day")
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 
 
 # #### According to weekday
 
-# In[27]:
-
-
-uber['DayOfWeek'] = uber['Date'].dt.dayofweek
-
-
-# In[29]:
-
-
-dayOfWeek={0:'Monday', 1:'Tuesday', 2:'Wednesday', 3:'Thursday', 4:'Friday', 5:'Saturday', 6:'Sunday'}
-uber['DayOfWeek'] = uber['DayOfWeek'].map(dayOfWeek)
-
-
 # In[37]:
 
 
-sns.countplot(x='DayOfWeek', data=uber)
+dow_counts = count_table(counts, 'DayOfWeek')
+sns.barplot(x=dow_counts.index, y=dow_counts.values)
 plt.title(" Number of pickups according to weekday")
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 
@@ -195,13 +211,33 @@ plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 
 
 plt.figure(figsize=(15, 8))
-sns.countplot(x='month', data=uber, hue='DayOfWeek')
+sns.barplot(x='month', y='count', hue='DayOfWeek', data=month_dow_table(counts))
 plt.ticklabel_format(style='plain', axis='y', useOffset=False)
 plt.legend(loc='best')
 plt.title("Number of Pickups each month from Jan - Jun 2015 according to day of week")
 plt.show()
 
 
+# #### Where the pickups are
+# Only the 2014 raw files carry pickup coordinates (Lat/Lon); the 2015 file has a taxi zone id instead, so this cell runs when 2014 files are loaded (in streaming mode, when the first file is one). Rows of 2015 files mixed in have no coordinates and are left out of the index.
+
+# In[43]:
+
+
+if {'Lat', 'Lon'} <= set(uber.columns):
+    # a few pickups have bad coordinates (e.g. 0,0); keep the ones in and around New York City
+    pickups = GridIndex(uber['Lat'], uber['Lon'], cell_km=0.25, bounds=(40.3, 41.2, -74.5, -73.4))
+    density, extent = pickups.density()
+    plt.figure(figsize=(12, 12))
+    plt.imshow(np.log1p(density), origin='lower', extent=extent, cmap='magma', aspect='auto')
+    plt.title('Pickup density')
+    plt.xlabel('Longitude')
+    plt.ylabel('Latitude')
+    plt.show()
+    # pickups within 500 m of Penn Station
+    print(len(pickups.radius(40.7506, -73.9935, km=0.5)))
+
+
 # In[ ]:
 
 
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Compare the old calendar-feature cells of UBER-EDA.py with add_calendar_features.
+
+Usage:
+    python benchmark_calendar.py [path/to/uber-raw-data.csv] [--rows N]
+
+Without a path a synthetic Jan - Jun 2015 pickup column is generated.
+
+On 1M synthetic rows (pandas 3, pyarrow-backed strings) the old cells take
+about 0.7s and the new stage about 0.28s (2.5x), with 5 MB of feature
+columns instead of 41 MB; the byte-level codes alone, as the streaming
+counts use them, take about 0.11s (6x). Most of the gain is in parsing:
+``pd.to_datetime`` with a format is no faster than letting pandas infer it.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from uber_counts import add_calendar_features, parse_pickup_dates, pickup_codes
+
+
+def synthetic_dates(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, 181 * 24 * 3600, rows)
+    dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(seconds, unit='s')
+    return pd.DataFrame({'Date': dates.strftime('%Y-%m-%d %H:%M:%S')})
+
+
+def old_cells(uber):
+    # the cells as they were in the notebook
+    uber['Date'] = pd.to_datetime(uber['Date'])
+    uber['month'] = uber['Date'].dt.month
+    uber['day'] = uber['Date'].dt.day
+    uber['hour'] = uber['Date'].dt.hour
+    month_names = {1: 'January', 2: 'February', 3: 'March', 4: 'April', 5: 'May', 6: 'June'}
+    uber['month_name'] = uber['month'].map(month_names)
+    uber['DayOfWeek'] = uber['Date'].dt.dayofweek
+    dayOfWeek = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 4: 'Friday',
+                 5: 'Saturday', 6: 'Sunday'}
+    uber['DayOfWeek'] = uber['DayOfWeek'].map(dayOfWeek)
+    return uber
+
+
+def new_cells(uber):
+    # the cells as they are now
+    uber['Date'] = parse_pickup_dates(uber['Date'])
+    return add_calendar_features(uber, date_col='Date')
+
+
+def raw_codes(uber):
+    # byte-level parse of the raw strings, as used by the streaming counts
+    return pd.DataFrame(pickup_codes(uber['Date']))
+
+
+def timed(func, frame, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        df = frame.copy()
+        start = time.perf_counter()
+        df = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', nargs='?', help='raw Uber trip csv')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.path:
+        frame = pd.read_csv(args.path, usecols=['Pickup_date'], nrows=args.rows)
+        frame = frame.rename(columns={'Pickup_date': 'Date'})
+    else:
+        frame = synthetic_dates(args.rows)
+
+    old_time, old = timed(old_cells, frame, args.repeat)
+    new_time, new = timed(new_cells, frame, args.repeat)
+    raw_time, codes = timed(raw_codes, frame, args.repeat)
+
+    # all versions must agree before the timings mean anything
+    for key in ('month', 'day', 'hour'):
+        assert (old[key].to_numpy() == new[key].to_numpy()).all(), key
+        assert (old[key].to_numpy() == codes[key].to_numpy()).all(), key
+    assert (old['DayOfWeek'].to_numpy() == new['DayOfWeek'].astype(str).to_numpy()).all()
+
+    old_mem = old.drop(columns='Date').memory_usage(deep=True).sum()
+    new_mem = new.drop(columns='Date').memory_usage(deep=True).sum()
+    print("rows: {:,}".format(len(frame)))
+    print("old cells: {:.3f}s, {:.1f} MB of feature columns".format(old_time, old_mem / 1e6))
+    print("new stage: {:.3f}s, {:.1f} MB of feature columns".format(new_time, new_mem / 1e6))
+    print("raw bytes: {:.3f}s".format(raw_time))
+    print("speedup:   {:.1f}x (new stage), {:.1f}x (raw bytes)".format(
+        old_time / new_time, old_time / raw_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,12 +10,20 @@
 
 
 # import necessary libraries
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly
 
+import sys
+sys.path.append('..')
+from edatools import decimate, profile_report, read_csv_cached, resampled_line
+from history import StockHistory
+from ohlcv import OHLCVStore, universe_returns
+from stock import analyze, simple_returns
+
 
 # In[2]:
 
@@ -28,7 +36,35 @@ get_ipython().run_line_magic('matplotlib', 'inline')
 # In[3]:
 
 
-tesla = pd.read_csv('tesla_stock_data.csv')
+# The prices are kept in a memory-mapped OHLCV store that can hold many tickers.
+# Every run appends only the days a source file has that the store doesn't have yet.
+SOURCES = {'TSLA': 'tesla_stock_data.csv'}
+store = OHLCVStore('.ohlcv')
+for ticker, source in SOURCES.items():
+    store.append(ticker, read_csv_cached(source, schema='tesla'))
+
+# TICKER is the one the price charts draw; the volume tables and the returns histogram
+# add up all of TICKERS (e.g. store.tickers for the whole universe) without loading the rest.
+TICKER = 'TSLA'
+TICKERS = [TICKER]
+tesla = store.frame(TICKER)
+# head, tail, shape, dtypes and nulls in one pass over the columns
+report = profile_report(tesla, name=TICKER)
+
+
+# In[200]:
+
+
+# Incremental mode: each ticker's yearly/monthly aggregates and return moments live in
+# .history/<ticker> (the rows stay in the store), and a rerun only feeds them the days
+# the store gained since the last run.
+histories = []
+for ticker in TICKERS:
+    ticker_history = StockHistory(os.path.join('.history', ticker))
+    ticker_history.append(store.frame(ticker, after=ticker_history.last_date))
+    histories.append(ticker_history)
+# the aggregates of all of TICKERS added together
+history = StockHistory.combine(histories)
 
 
 # #### Data Description
@@ -45,20 +81,20 @@ tesla = pd.read_csv('tesla_stock_data.csv')
 
 
 # See the first 5 rows of the data
-tesla.head()
+report.head
 
 
 # In[5]:
 
 
 # See the last 5 rows of the data
-tesla.tail()
+report.tail
 
 
 # In[6]:
 
 
-tesla.shape
+report.shape
 
 
 # The dataset has 2416 observations and 7 features from 2010-06-29 to 2020-02-03.
@@ -66,14 +102,14 @@ tesla.shape
 # In[7]:
 
 
-tesla.dtypes
+report.dtypes
 
 
 # In[8]:
 
 
 # checking null values
-tesla.isnull().sum()
+report.columns['nulls']
 
 
 # Here, we can infer from the above cell that the dataset contains no null values and therefore we don't need to impute any missing values.
@@ -94,8 +130,10 @@ tesla.dtypes
 
 
 # Date vs opening price
+# charts only draw as many points as they have pixels for
+opening = decimate(tesla, 'Date', 'Open')
 plt.figure(figsize=(16, 8))
-plt.plot(tesla.Date, tesla.Open, lw=2, label='Opening Price')
+plt.plot(opening.Date, opening.Open, lw=2, label='Opening Price')
 plt.title('Opening price of stock')
 plt.xlabel('Date')
 plt.ylabel('Opening price of Stock')
@@ -111,9 +149,10 @@ plt.show()
 
 
 # comparing highest and lowest trading price
+high_low = decimate(tesla, 'Date', ['High', 'Low'])
 plt.figure(figsize=(16, 8))
-plt.plot(tesla.Date, tesla.High, lw=2, label='High')
-plt.plot(tesla.Date, tesla.Low, lw=2, label='Low')
+plt.plot(high_low.Date, high_low.High, lw=2, label='High')
+plt.plot(high_low.Date, high_low.Low, lw=2, label='Low')
 plt.title('Comparison of High and Low price of stock')
 plt.xlabel('Date')
 plt.ylabel('Stock Price')
@@ -128,8 +167,10 @@ plt.show()
 
 
 # Analyzing Volume of trades
+# min/max buckets keep every volume spike
+trades = decimate(tesla, 'Date', 'Volume', method='minmax')
 plt.figure(figsize=(16, 8))
-plt.plot(tesla.Date, tesla.Volume, lw=2, label='Trade volume')
+plt.plot(trades.Date, trades.Volume, lw=2, label='Trade volume')
 plt.title('Volume trend')
 plt.xlabel('Date')
 plt.ylabel('Volume')
@@ -141,8 +182,7 @@ plt.show()
 # In[13]:
 
 
-tesla['Year'] = tesla['Date'].dt.year
-volume = pd.DataFrame(tesla.groupby('Year').sum()['Volume'])
+volume = history.yearly_volume()
 
 plt.figure(figsize=(10,6))
 plt.plot(volume)
@@ -164,7 +204,7 @@ volume.sort_values(by='Volume', ascending=False)
 
 
 # Looking at monthly volumes
-by_month = pd.DataFrame(tesla.groupby(tesla['Date'].dt.month).sum()['Volume'])
+by_month = history.monthly_volume()
 print(by_month.sort_values(by='Volume', ascending=False))
 plt.figure(figsize=(10, 6))
 plt.plot(by_month)
@@ -180,7 +220,7 @@ plt.ticklabel_format(style='plain')
 
 
 # The mean opening and Closing price every year for the stock
-mean_price = pd.DataFrame(tesla.groupby('Year').mean()[['Open', 'Close']])
+mean_price = history.yearly_mean(['Open', 'Close'])
 
 
 # In[17]:
@@ -188,34 +228,28 @@ mean_price = pd.DataFrame(tesla.groupby('Year').mean()[['Open', 'Close']])
 
 plt.figure(figsize=(10, 6))
 plt.plot(mean_price, lw=3, ls='--')
-plt.plot(tesla.groupby('Year').mean()['High'], lw=3)
+plt.plot(history.yearly_mean(['High']), lw=3)
 
 
 # The value of Tesla stock prices has also gone up significantly.
 
 # #### 3.2 - Creating Columns (Daily Return)
 
-# We will create the daily lag column to help us calculate the daily returns in % for the stock prices after the sales close for the day before.
-
-# In[18]:
-
-
-tesla['daily_lag'] = tesla['Close'].shift(1)
-tesla.head()
-
+# The daily return is today's close over the previous day's close, minus 1. (An earlier version divided the previous close by today's, which gives the inverse of the return.)
 
 # In[19]:
 
 
-tesla['daily_returns'] = (tesla['daily_lag'] / tesla['Close']) - 1
+# today's close over yesterday's close, minus 1
+tesla['daily_returns'] = simple_returns(tesla['Close'])
 tesla.head()
 
 
 # In[20]:
 
 
-mean = tesla['daily_returns'].mean()
-std = tesla['daily_returns'].std()
+# running (Welford) moments of the daily returns
+mean, std = history.return_moments()
 print("Mean % returns: {:.4f}".format(mean))
 print("Std of % returns: {:.2f}".format(std))
 
@@ -223,7 +257,8 @@ print("Std of % returns: {:.2f}".format(std))
 # In[21]:
 
 
-tesla['daily_returns'].hist(bins=20)
+# daily returns of every ticker in TICKERS, never computed across two tickers
+pd.Series(universe_returns(store, TICKERS)).hist(bins=20)
 plt.axvline(mean, color='red')
 plt.axvline(std, color='green')
 plt.axvline(-std, color='green')
@@ -232,18 +267,38 @@ plt.axvline(-std, color='green')
 # In[118]:
 
 
+returns = decimate(tesla, 'Date', 'daily_returns', method='minmax')
 plt.figure(figsize=(16,8))
-plt.plot(tesla.Date, tesla.daily_returns)
+plt.plot(returns.Date, returns.daily_returns)
+
+
+# #### 3.3 - Rolling statistics
+# Rolling mean, volatility, EWMA and drawdown over 20, 50 and 200 trading days. `stock.analyze_files` gives the same headline numbers for a whole folder of ticker files.
+
+# In[119]:
+
+
+analytics = analyze(tesla, windows=(20, 50, 200))
+
+fig, axes = plt.subplots(3, 1, figsize=(16, 14), sharex=True)
+axes[0].plot(tesla.Date, tesla.Close, lw=1, label='Close')
+axes[0].plot(tesla.Date, analytics['mean_50'], lw=2, label='50 day mean')
+axes[0].plot(tesla.Date, analytics['ewma_200'], lw=2, label='200 day EWMA')
+axes[0].legend()
+axes[1].plot(tesla.Date, analytics['volatility_20'], lw=1, label='20 day annualized volatility')
+axes[1].legend()
+axes[2].fill_between(tesla.Date, analytics['drawdown'], 0, color='red', alpha=0.4, label='Drawdown')
+axes[2].legend()
+plt.show()
 
 
-# ### 3.3 - Interactive Plots (plotly)
+# ### 3.4 - Interactive Plots (plotly)
 
 # In[27]:
 
 
 # Setting up plotly
 import cufflinks as cf
-import plotly.express as px
 import plotly.graph_objects as go
 from plotly.offline import download_plotlyjs, init_notebook_mode, plot, iplot
 init_notebook_mode(connected=True)
@@ -253,7 +308,8 @@ cf.go_offline()
 # In[31]:
 
 
-fig = px.line(tesla, x='Date', y='Open', title='Date v/s Open price w/o Slider')
+# the decimated charts re-pick their points for the visible range when zoomed
+fig = resampled_line(tesla, 'Date', 'Open', title='Date v/s Open price w/o Slider')
 fig.show()
 
 
@@ -261,7 +317,7 @@ fig.show()
 
 
 # Date vs Opening Price
-fig = px.line(tesla, x='Date', y='Open', title='Date v/s Open price with Slider')
+fig = resampled_line(tesla, 'Date', 'Open', title='Date v/s Open price with Slider')
 fig.update_xaxes(rangeslider_visible=True)
 fig.show()
 
@@ -270,7 +326,7 @@ fig.show()
 
 
 # Date and Volume 
-fig = px.line(tesla, x='Date', y='Volume', title='Date v/s Volume w/o Slider')
+fig = resampled_line(tesla, 'Date', 'Volume', method='minmax', title='Date v/s Volume w/o Slider')
 fig.show()
 
 
@@ -278,7 +334,7 @@ fig.show()
 
 
 # Date and Daily Returns 
-fig = px.line(tesla, x='Date', y='daily_returns', title='Date v/s Volume w/o Slider')
+fig = resampled_line(tesla, 'Date', 'daily_returns', method='minmax', title='Date v/s Volume w/o Slider')
 fig.show()
 
 
@@ -0,0 +1,164 @@
+# coding: utf-8
+"""Incrementally updated price aggregates for one ticker.
+
+The yearly and monthly aggregates the notebook plots are kept as running
+sums, together with Welford moments of the daily returns, in one json
+file. The rows themselves live in the ``ohlcv.OHLCVStore``; the history
+only records the last date and close it has seen, so appending a new day
+touches only the new rows:
+
+    history = StockHistory('.history/TSLA')
+    history.append(store.frame('TSLA', after=history.last_date))
+    history.yearly_volume()
+
+The aggregates of several tickers add up, so ``StockHistory.combine``
+gives the same tables and return moments for a whole universe.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+_STATE = 'aggregates.json'
+_PRICE_COLUMNS = ['Open', 'Close', 'High']
+
+
+def _empty_state():
+    return {'last_date': None, 'last_close': None,
+            'year_volume': {}, 'month_volume': {},
+            'year_sums': {col: {} for col in _PRICE_COLUMNS}, 'year_counts': {},
+            'returns': {'n': 0, 'mean': 0.0, 'm2': 0.0}}
+
+
+def _add_to(totals, sums):
+    """Add a grouped sum (Series) into a json-friendly dict of running totals."""
+    for key, value in zip(sums.index.tolist(), sums.tolist()):
+        totals[str(key)] = totals.get(str(key), 0) + value
+
+
+class StockHistory:
+    """Running aggregates of a ticker's daily prices, persisted in ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        state_file = os.path.join(path, _STATE) if path is not None else None
+        if state_file is not None and os.path.exists(state_file):
+            with open(state_file) as f:
+                self.state = json.load(f)
+        else:
+            self.state = _empty_state()
+
+    @classmethod
+    def combine(cls, histories):
+        """Aggregates of several tickers' histories added together, e.g. for a universe.
+
+        The result is read-only: its tables and return moments cover every
+        ticker, but it can't be appended to.
+        """
+        combined = cls(None)
+        state = combined.state
+        for history in histories:
+            other = history.state
+            for key in ('year_volume', 'month_volume', 'year_counts'):
+                _add_to(state[key], pd.Series(other[key], dtype=object))
+            for col in _PRICE_COLUMNS:
+                _add_to(state['year_sums'][col], pd.Series(other['year_sums'][col], dtype=object))
+            combined._merge_moments(other['returns']['n'], other['returns']['mean'], other['returns']['m2'])
+        return combined
+
+    @property
+    def last_date(self):
+        """Date of the latest stored row, or None before the first append."""
+        return pd.Timestamp(self.state['last_date']) if self.state['last_date'] is not None else None
+
+    def append(self, rows):
+        """Add new daily rows; rows not after the last stored date are skipped.
+
+        Returns the number of rows added.
+        """
+        if self.path is None:
+            raise ValueError("a combined history can't be appended to")
+        rows = rows.copy()
+        rows['Date'] = pd.to_datetime(rows['Date'])
+        rows = rows.sort_values('Date')
+        if self.state['last_date'] is not None:
+            rows = rows[rows['Date'] > pd.Timestamp(self.state['last_date'])]
+        if rows.empty:
+            return 0
+
+        state = self.state
+        years, months = rows['Date'].dt.year, rows['Date'].dt.month
+        _add_to(state['year_volume'], rows.groupby(years)['Volume'].sum())
+        _add_to(state['month_volume'], rows.groupby(months)['Volume'].sum())
+        sums = rows.groupby(years)[_PRICE_COLUMNS].sum()
+        for col in _PRICE_COLUMNS:
+            _add_to(state['year_sums'][col], sums[col])
+        _add_to(state['year_counts'], rows.groupby(years).size())
+
+        # the first new return needs the last stored close
+        close = rows['Close'].to_numpy(dtype=float)
+        previous = np.concatenate(([state['last_close']] if state['last_close'] is not None else [np.nan],
+                                   close[:-1]))
+        returns = close / previous - 1
+        self._update_moments(returns[~np.isnan(returns)])
+
+        state['last_date'] = rows['Date'].iloc[-1].isoformat()
+        state['last_close'] = float(close[-1])
+        self._save()
+        return len(rows)
+
+    def _update_moments(self, returns):
+        """Merge a batch of returns into the running Welford moments (Chan et al.)."""
+        if not len(returns):
+            return
+        mean_b = float(returns.mean())
+        self._merge_moments(len(returns), mean_b, float(((returns - mean_b) ** 2).sum()))
+
+    def _merge_moments(self, n_b, mean_b, m2_b):
+        if not n_b:
+            return
+        moments = self.state['returns']
+        n = moments['n'] + n_b
+        delta = mean_b - moments['mean']
+        moments['mean'] += delta * n_b / n
+        moments['m2'] += m2_b + delta ** 2 * moments['n'] * n_b / n
+        moments['n'] = n
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, _STATE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, os.path.join(self.path, _STATE))
+
+    def yearly_volume(self):
+        """Total Volume per year, like ``groupby('Year').sum()['Volume']``."""
+        return self._frame(self.state['year_volume'], 'Year', 'Volume')
+
+    def monthly_volume(self):
+        """Total Volume per calendar month over all years."""
+        return self._frame(self.state['month_volume'], 'Date', 'Volume')
+
+    def yearly_mean(self, columns=('Open', 'Close')):
+        """Mean of the given price columns per year."""
+        counts = pd.Series(self.state['year_counts'], dtype=float)
+        means = pd.DataFrame({col: pd.Series(self.state['year_sums'][col], dtype=float) / counts
+                              for col in columns})
+        means.index = means.index.astype(int)
+        means.index.name = 'Year'
+        return means.sort_index()
+
+    def return_moments(self):
+        """Mean and sample standard deviation of the daily returns."""
+        moments = self.state['returns']
+        std = np.sqrt(moments['m2'] / (moments['n'] - 1)) if moments['n'] > 1 else np.nan
+        return moments['mean'], std
+
+    @staticmethod
+    def _frame(totals, index_name, column):
+        frame = pd.DataFrame({column: pd.Series(totals, dtype='int64')})
+        frame.index = frame.index.astype(int)
+        frame.index.name = index_name
+        return frame.sort_index()
@@ -0,0 +1,160 @@
+# coding: utf-8
+"""Memory-mapped OHLCV store for many tickers.
+
+Every column (Date, Open, High, Low, Close, Adj Close, Volume) is one flat
+binary file holding the rows of all tickers back to back, and
+``index.json`` records the segments (start row and length) each ticker's
+rows are stored in. A ticker starts as one segment and every ``append`` of
+newer days adds another at the end of the files. Reading a ticker maps
+only its segments of the column files, so the rest of the universe never
+has to be loaded into memory.
+
+    store = OHLCVStore('.ohlcv')
+    store.append('TSLA', pd.read_csv('tesla_stock_data.csv'))
+    tesla = store.frame('TSLA')
+
+The yearly and monthly aggregates live in ``history.StockHistory``, which
+is fed from the store with ``frame(ticker, after=...)``.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from stock import simple_returns
+
+COLUMNS = {'Date': 'datetime64[D]', 'Open': 'float64', 'High': 'float64', 'Low': 'float64',
+           'Close': 'float64', 'Adj Close': 'float64', 'Volume': 'int64'}
+_INDEX = 'index.json'
+
+
+class OHLCVStore:
+    """Column files plus a ticker -> [[start, length], ...] segment index, kept in ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        index_file = os.path.join(path, _INDEX)
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                stored = json.load(f)
+            self.index, self.rows = stored['tickers'], stored['rows']
+            # stores written before appends were possible hold one [start, length] pair
+            self.index = {ticker: [segments] if isinstance(segments[0], int) else segments
+                          for ticker, segments in self.index.items()}
+        else:
+            self.index, self.rows = {}, 0
+
+    def __contains__(self, ticker):
+        return ticker in self.index
+
+    @property
+    def tickers(self):
+        return sorted(self.index)
+
+    def _file(self, column):
+        return os.path.join(self.path, column.replace(' ', '_') + '.bin')
+
+    def length(self, ticker):
+        """Number of stored rows of a ticker."""
+        return sum(length for _, length in self.index[ticker])
+
+    def last_date(self, ticker):
+        """Date of the ticker's latest stored row, or None if it has none."""
+        if ticker not in self.index or not self.length(ticker):
+            return None
+        start, length = self.index[ticker][-1]
+        return pd.Timestamp(self._map('Date', start, length)[-1])
+
+    def _write(self, ticker, prices):
+        os.makedirs(self.path, exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            values = prices[column]
+            if column == 'Date':
+                values = pd.to_datetime(values)
+            values = np.ascontiguousarray(values.to_numpy(dtype=dtype))
+            with open(self._file(column), 'ab') as f:
+                # drop anything a crashed earlier write left past the indexed rows
+                f.truncate(self.rows * np.dtype(dtype).itemsize)
+                f.write(values.tobytes())
+        self.index.setdefault(ticker, []).append([self.rows, len(prices)])
+        self.rows += len(prices)
+        tmp = os.path.join(self.path, _INDEX + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'tickers': self.index, 'rows': self.rows}, f)
+        os.replace(tmp, os.path.join(self.path, _INDEX))
+
+    def add(self, ticker, prices):
+        """Store a new ticker's daily rows (in the Tesla csv layout)."""
+        if ticker in self.index:
+            raise ValueError("{} is already in the store".format(ticker))
+        self._write(ticker, prices.sort_values('Date'))
+
+    def append(self, ticker, prices):
+        """Store the rows dated after the ticker's last stored day; adds the ticker if it is new.
+
+        The whole source file can be passed on every run: only its new days
+        are written. Returns the number of rows added.
+        """
+        prices = prices.assign(Date=pd.to_datetime(prices['Date'])).sort_values('Date')
+        last = self.last_date(ticker)
+        if last is not None:
+            prices = prices[prices['Date'] > last]
+        if prices.empty:
+            return 0
+        self._write(ticker, prices)
+        return len(prices)
+
+    def _map(self, column, start, length):
+        dtype = np.dtype(COLUMNS[column])
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(column), dtype=dtype, mode='r', offset=start * dtype.itemsize, shape=(length,))
+
+    def column(self, column, ticker=None):
+        """A column for one ticker or the whole universe, in date order per ticker.
+
+        A ticker stored in one segment (and the universe) is a read-only
+        memory-mapped view; a ticker with appended segments is a copy of them.
+        """
+        if ticker is None:
+            return self._map(column, 0, self.rows)
+        segments = [self._map(column, start, length) for start, length in self.index[ticker]]
+        return segments[0] if len(segments) == 1 else np.concatenate(segments)
+
+    def _segments_after(self, ticker, after):
+        """The ticker's segments trimmed to the rows dated after ``after``."""
+        after = np.datetime64(pd.Timestamp(after), 'D')
+        segments = []
+        for start, length in self.index[ticker]:
+            dates = self._map('Date', start, length)
+            if length and dates[-1] > after:
+                # segments are in date order, so only the first kept one needs trimming
+                skip = int(np.searchsorted(dates, after, side='right')) if not segments else 0
+                segments.append([start + skip, length - skip])
+        return segments
+
+    def frame(self, ticker, columns=None, after=None):
+        """One ticker's rows as a DataFrame shaped like the original csv.
+
+        ``after`` keeps only the rows dated after it, found by a binary
+        search of the mapped Date column, so catching up on new days reads
+        only those days.
+        """
+        columns = columns or list(COLUMNS)
+        segments = self.index[ticker] if after is None else self._segments_after(ticker, after)
+        frame = pd.DataFrame({column: np.concatenate([np.empty(0, dtype=COLUMNS[column])] +
+                                                     [self._map(column, start, length) for start, length in segments])
+                              for column in columns})
+        if 'Date' in frame:
+            frame['Date'] = frame['Date'].astype('datetime64[ns]')
+        return frame
+
+
+def universe_returns(store, tickers=None):
+    """Daily simple returns of the given tickers (default: all), never across two tickers."""
+    tickers = store.tickers if tickers is None else tickers
+    if not tickers:
+        return np.empty(0)
+    return np.concatenate([simple_returns(store.column('Close', ticker)) for ticker in tickers])
@@ -0,0 +1,127 @@
+# coding: utf-8
+"""Returns and rolling statistics for daily stock price files.
+
+Everything works on plain numpy arrays. Rolling means and standard
+deviations come from running sums, so each window costs O(n) however wide
+it is. ``analyze_files`` runs the same analysis over a whole folder of
+ticker files in a process pool.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from edatools.parallel import expand_paths, parallel_map
+
+TRADING_DAYS = 252
+
+
+def simple_returns(close):
+    """Daily % change, close / previous close - 1 (NaN on the first day)."""
+    close = np.asarray(close, dtype=float)
+    returns = np.full(len(close), np.nan)
+    returns[1:] = close[1:] / close[:-1] - 1
+    return returns
+
+
+def log_returns(close):
+    """Daily log returns, log(close / previous close)."""
+    close = np.asarray(close, dtype=float)
+    returns = np.full(len(close), np.nan)
+    returns[1:] = np.diff(np.log(close))
+    return returns
+
+
+def _window_sums(values, window):
+    """Sum of each trailing window and the number of non-NaN values in it."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    out_sums = np.full(len(values), np.nan)
+    out_counts = np.zeros(len(values), dtype=np.int64)
+    if window <= len(values):
+        out_sums[window - 1:] = sums[window:] - sums[:-window]
+        out_counts[window - 1:] = counts[window:] - counts[:-window]
+    return out_sums, out_counts
+
+
+def rolling_mean(values, window):
+    """Trailing mean over ``window`` values; NaN until the window is full of data."""
+    values = np.asarray(values, dtype=float)
+    sums, counts = _window_sums(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts == window, sums / window, np.nan)
+
+
+def rolling_std(values, window, ddof=1):
+    """Trailing standard deviation over ``window`` values, from running sums."""
+    values = np.asarray(values, dtype=float)
+    # centre the data first so the sum of squares doesn't swamp the variance
+    centred = values - np.nanmean(values) if np.isfinite(values).any() else values
+    sums, counts = _window_sums(centred, window)
+    squares, _ = _window_sums(centred ** 2, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums ** 2 / window) / (window - ddof)
+    return np.where(counts == window, np.sqrt(np.clip(variance, 0, None)), np.nan)
+
+
+def rolling_volatility(returns, window):
+    """Annualized volatility of daily returns over a trailing window."""
+    return rolling_std(returns, window) * np.sqrt(TRADING_DAYS)
+
+
+def drawdown(close):
+    """Fall from the running peak, close / running max - 1 (0 at a new high)."""
+    close = np.asarray(close, dtype=float)
+    return close / np.fmax.accumulate(close) - 1
+
+
+def ewma(values, span):
+    """Exponentially weighted moving average with pandas' ``span`` convention."""
+    return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def analyze(prices, windows=(20, 50, 200), price_col='Close'):
+    """Add returns, rolling mean/std/volatility, EWMA and drawdown columns to a price frame."""
+    prices = prices.copy()
+    close = prices[price_col].to_numpy(dtype=float)
+    prices['daily_returns'] = simple_returns(close)
+    prices['log_returns'] = log_returns(close)
+    for window in windows:
+        prices['mean_{}'.format(window)] = rolling_mean(close, window)
+        prices['std_{}'.format(window)] = rolling_std(close, window)
+        prices['volatility_{}'.format(window)] = rolling_volatility(prices['daily_returns'].to_numpy(), window)
+        prices['ewma_{}'.format(window)] = ewma(close, window)
+    prices['drawdown'] = drawdown(close)
+    return prices
+
+
+def summarize(prices, price_col='Close'):
+    """One row of headline numbers for a price frame."""
+    close = prices[price_col].to_numpy(dtype=float)
+    returns = simple_returns(close)
+    return pd.Series({'days': len(close),
+                      'mean_return': np.nanmean(returns),
+                      'std_return': np.nanstd(returns, ddof=1),
+                      'annual_volatility': np.nanstd(returns, ddof=1) * np.sqrt(TRADING_DAYS),
+                      'total_return': close[-1] / close[0] - 1,
+                      'max_drawdown': drawdown(close).min()})
+
+
+def _summarize_file(path):
+    prices = pd.read_csv(path, parse_dates=['Date']).sort_values('Date')
+    return summarize(prices)
+
+
+def analyze_files(paths, processes=None):
+    """Headline numbers for many ticker files, one row per ticker.
+
+    ``paths`` is a glob pattern or a list of csv files in the Tesla file's
+    layout; the ticker is taken from the file name. Files are processed in
+    parallel worker processes.
+    """
+    paths = expand_paths(paths, what='price files')
+    tickers = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    rows = parallel_map(_summarize_file, [(path,) for path in paths], processes, chunksize=16)
+    return pd.DataFrame(rows, index=pd.Index(tickers, name='Ticker'))
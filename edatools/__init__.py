@@ -0,0 +1,17 @@
+# coding: utf-8
+"""Helpers shared by the EDA notebooks in this repo.
+
+The notebooks live in their own folders, so they pull this package in with
+
+    import sys
+    sys.path.append('..')
+"""
+
+from edatools.binning import Binner, QuantileSketch, fit_or_load
+from edatools.cache import read_csv_cached
+from edatools.correlation import streaming_corr
+from edatools.downsample import decimate, resampled_line
+from edatools.geo import GridIndex
+from edatools.parallel import expand_paths, parallel_map
+from edatools.profiling import profile_columns, profile_file, profile_report
+from edatools.schemas import SCHEMAS, optimize_dtypes
@@ -0,0 +1,6 @@
+# coding: utf-8
+"""``python -m edatools PATH`` prints the profiling report of a csv file."""
+
+from edatools.profiling import main
+
+main()
@@ -0,0 +1,166 @@
+# coding: utf-8
+"""Bin edges that are learnt once and reused.
+
+``pd.cut(values, bins=10)`` works the edges out again from every load's
+minimum and maximum, so the bins move whenever rows are added and
+aggregates built on different days can't be combined. A ``Binner``
+holds fixed edges (equal-width, quantile or given), saves them to json
+and assigns bins to new batches with one ``searchsorted``. Its bins are
+right-closed like ``pd.cut``'s, and ``cut`` returns the same categorical.
+
+    age_bins = fit_or_load('.bins/age.json', fb['age'], bins=10)
+    codes = age_bins.codes(batch['age'])
+
+For data that arrives as a stream, ``QuantileSketch`` keeps a mergeable
+uniform sample from which quantile edges can be learnt without holding
+all the values.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SKETCH_SIZE = 10000
+
+
+class QuantileSketch:
+    """Uniform sample of a stream of values (a bottom-k sketch).
+
+    Every value gets a random key and the ``size`` values with the smallest
+    keys are kept, so the sample stays uniform however the values are
+    batched, and two sketches merge by keeping the smallest keys of both.
+    Quantiles and ranks read from the sample are accurate to about
+    ``1 / sqrt(size)`` of the data.
+    """
+
+    def __init__(self, size=SKETCH_SIZE, seed=0):
+        self.size = size
+        self._rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.values = np.empty(0)
+
+    def _keep(self, keys, values):
+        if len(keys) > self.size:
+            smallest = np.argpartition(keys, self.size - 1)[:self.size]
+            keys, values = keys[smallest], values[smallest]
+        self.keys, self.values = keys, values
+
+    def add(self, values):
+        """Add a batch of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self._keep(np.concatenate((self.keys, self._rng.random(len(values)))),
+                   np.concatenate((self.values, values)))
+        return self
+
+    def merge(self, other):
+        """Fold in a sketch built (with a different seed) over other values."""
+        self._keep(np.concatenate((self.keys, other.keys)), np.concatenate((self.values, other.values)))
+        return self
+
+    def quantile(self, q):
+        return np.quantile(self.values, q)
+
+    def ranks(self, values):
+        """Mid-rank of each value within the sample, as a fraction in [0, 1]; NaN stays NaN."""
+        sample = np.sort(self.values)
+        x = np.asarray(values, dtype=float)
+        mid = (np.searchsorted(sample, x, side='left') + np.searchsorted(sample, x, side='right')) / 2
+        return np.where(np.isnan(x), np.nan, mid / max(len(sample), 1))
+
+
+class Binner:
+    """Fixed right-closed bins ``(edges[i], edges[i + 1]]``, like ``pd.cut``'s."""
+
+    def __init__(self, edges, precision=3):
+        edges = np.asarray(edges, dtype=float)
+        if len(edges) < 2 or (np.diff(edges) <= 0).any():
+            raise ValueError("bin edges must be increasing")
+        self.edges = edges
+        self.precision = precision
+
+    @classmethod
+    def equal_width(cls, values, bins=10, precision=0):
+        """The edges ``pd.cut(values, bins)`` would pick: equal width, left edge nudged down 0.1%."""
+        values = np.asarray(values, dtype=float)
+        low, high = np.nanmin(values), np.nanmax(values)
+        if low == high:
+            low -= 0.001 * abs(low) if low != 0 else 0.001
+            high += 0.001 * abs(high) if high != 0 else 0.001
+            return cls(np.linspace(low, high, bins + 1), precision)
+        edges = np.linspace(low, high, bins + 1)
+        edges[0] -= (high - low) * 0.001
+        return cls(edges, precision)
+
+    @classmethod
+    def quantile(cls, values, bins=10, precision=0):
+        """Edges at the quantiles of ``values`` (or of a ``QuantileSketch``), like ``pd.qcut``."""
+        if isinstance(values, QuantileSketch):
+            values = values.values
+        values = np.asarray(values, dtype=float)
+        edges = np.unique(np.nanquantile(values, np.linspace(0, 1, bins + 1)))
+        # qcut includes the minimum in the first bin
+        edges[0] -= (edges[-1] - edges[0]) * 0.001 or 0.001
+        return cls(edges, precision)
+
+    @classmethod
+    def fixed(cls, edges, precision=0):
+        return cls(edges, precision)
+
+    @property
+    def bins(self):
+        return len(self.edges) - 1
+
+    def codes(self, values):
+        """Bin of every value, 0 to ``bins - 1``; -1 for NaN or values outside the edges."""
+        values = np.asarray(values, dtype=float)
+        codes = np.searchsorted(self.edges, values, side='left') - 1
+        codes[(codes < 0) | (codes >= self.bins) | np.isnan(values)] = -1
+        return codes
+
+    @property
+    def labels(self):
+        """The interval categories ``pd.cut`` shows for these edges."""
+        return pd.cut(np.array([], dtype=float), bins=self.edges, precision=self.precision).categories
+
+    def cut(self, values):
+        """Drop-in for ``pd.cut(values, bins=self.edges)``: an ordered categorical of intervals."""
+        return pd.Categorical.from_codes(self.codes(values), dtype=pd.CategoricalDtype(self.labels, ordered=True))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'edges': self.edges.tolist(), 'precision': self.precision}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            stored = json.load(f)
+        return cls(stored['edges'], stored['precision'])
+
+    def __eq__(self, other):
+        return isinstance(other, Binner) and np.array_equal(self.edges, other.edges)
+
+
+def fit_or_load(path, values, method='equal_width', **kwargs):
+    """The bins saved at ``path``, or new ones learnt from ``values`` and saved there.
+
+    ``values`` may be a function returning them, so data that is costly to
+    gather (a scan of every partition, say) is only read when the bins have
+    to be learnt. ``method`` is ``'equal_width'`` or ``'quantile'``;
+    ``kwargs`` go to it (``bins``, ``precision``). Delete the file to learn
+    the bins again.
+    """
+    if os.path.exists(path):
+        return Binner.load(path)
+    if method not in ('equal_width', 'quantile'):
+        raise ValueError("method must be 'equal_width' or 'quantile'")
+    if callable(values):
+        values = values()
+    binner = getattr(Binner, method)(values, **kwargs)
+    binner.save(path)
+    return binner
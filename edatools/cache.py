@@ -0,0 +1,103 @@
+# coding: utf-8
+"""Columnar cache for the csv files the notebooks load.
+
+The first read of a csv parses it as usual and writes a Feather copy next
+to it (in a ``.eda_cache`` folder). Later reads memory-map that copy and
+load only the columns asked for, so the csv is never parsed again until it
+changes. The cache key is the source path, its mtime and size, and the
+``read_csv`` arguments and dtype schema, since those decide what the parsed
+frame looks like. With a schema the cached copy is already dtype-optimized,
+so categoricals and downcast numerics come straight out of the cache.
+
+Without pyarrow installed this falls back to plain ``pd.read_csv``.
+"""
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from edatools.schemas import INT_FLOOR, SCHEMAS, check_schema, optimize_dtypes
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+CACHE_DIR = '.eda_cache'
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def cache_path(path, cache_dir=None, **read_csv_kwargs):
+    """Where the columnar copy of ``path`` lives for the current file version.
+
+    The name is ``<stem>-<path digest>-<file version>-<arguments digest>``,
+    so copies of one file made with different arguments live side by side.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(path), CACHE_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    version = _digest(stat.st_mtime_ns, stat.st_size)
+    arguments = _digest(sorted(read_csv_kwargs.items()))
+    return os.path.join(cache_dir, '{}-{}-{}-{}.feather'.format(stem, _digest(path), version, arguments))
+
+
+def remove_stale(target, suffix='.feather'):
+    """Delete the ``suffix`` files cached for other versions of ``target``'s source.
+
+    Entries for the same file version made with other arguments are kept.
+    """
+    source, version, _ = target[:-len(suffix)].rsplit('-', 2)
+    for entry in glob.glob(glob.escape(source) + '-*-*' + glob.escape(suffix)):
+        if entry[:-len(suffix)].rsplit('-', 2)[1] != version:
+            os.remove(entry)
+
+
+def _write_cache(df, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    remove_stale(target)
+    tmp = target + '.tmp'
+    # uncompressed, so reads are zero-copy views of the memory-mapped file
+    feather.write_feather(df.reset_index(drop=True), tmp, compression='uncompressed')
+    os.replace(tmp, target)
+
+
+def read_csv_cached(path, columns=None, cache_dir=None, schema=None, **read_csv_kwargs):
+    """``pd.read_csv`` backed by a memory-mapped Feather cache.
+
+    ``columns`` restricts what is loaded; the cache itself always holds the
+    whole file so other analyses can reuse it. ``schema`` is a dict or the
+    name of one of ``edatools.schemas.SCHEMAS``; it is applied when the file
+    is parsed and checked again on every cached load.
+    """
+    name = os.path.basename(path)
+    if isinstance(schema, str):
+        schema = SCHEMAS[schema]
+
+    if feather is None:
+        df = pd.read_csv(path, usecols=columns, **read_csv_kwargs)
+        if schema is not None:
+            schema = {col: dtype for col, dtype in schema.items() if columns is None or col in columns}
+            df = optimize_dtypes(df, schema, name=name)
+        return df
+
+    # the integer floor decides the cached dtypes as much as the schema does
+    target = cache_path(path, cache_dir, schema=schema, int_floor=np.dtype(INT_FLOOR).name, **read_csv_kwargs)
+    if not os.path.exists(target):
+        df = pd.read_csv(path, **read_csv_kwargs)
+        if schema is not None:
+            df = optimize_dtypes(df, schema, name=name)
+        _write_cache(df, target)
+        return df[columns] if columns is not None else df
+
+    table = feather.read_table(target, columns=columns, memory_map=True)
+    df = table.to_pandas()
+    if schema is not None:
+        check_schema(df, schema)
+    return df
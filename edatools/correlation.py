@@ -0,0 +1,182 @@
+# coding: utf-8
+"""Correlation matrices accumulated chunk by chunk.
+
+``DataFrame.corr()`` needs the whole numeric frame in memory. Here every
+chunk of rows is reduced to per-pair counts, means, sums of squared
+deviations and co-moments, and chunks (or whole workers' results) are
+combined with the pairwise update of Chan et al., which stays accurate
+where raw sums of squares would not. Like ``corr()`` each pair of columns
+uses the rows where both are present, so the result matches the
+in-memory Pearson matrix.
+
+Spearman correlations need ranks, which can't be known before all the
+data has been seen. They are approximated by ranking each value within a
+mergeable uniform sample of its column (``binning.QuantileSketch``), built
+in a first pass, and then taking the Pearson correlation of those ranks.
+
+    corr = streaming_corr('listings/*.csv', chunksize=100000)
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from edatools.binning import SKETCH_SIZE, QuantileSketch
+from edatools.parallel import expand_paths, parallel_map
+
+CHUNKSIZE = 100000
+
+
+def numeric_columns(df):
+    """The columns ``corr()`` would use: numeric and boolean ones."""
+    return list(df.select_dtypes(include=['number', 'bool']).columns)
+
+
+class RankSketch:
+    """A ``QuantileSketch`` per column, for approximate ranks.
+
+    The sketches are uniform samples that merge in any order, so the
+    sketches of several workers combine into the sketch of all their data.
+    """
+
+    def __init__(self, columns, size=SKETCH_SIZE, seed=0):
+        self.columns = list(columns)
+        self.sketches = [QuantileSketch(size, seed=seed * len(self.columns) + i)
+                         for i in range(len(self.columns))]
+
+    def add(self, chunk):
+        for column, sketch in zip(self.columns, self.sketches):
+            sketch.add(chunk[column].to_numpy(dtype=float))
+        return self
+
+    def merge(self, other):
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def ranks(self, chunk):
+        """Each value's mid-rank within its column's sample, as a fraction (NaN stays NaN)."""
+        return pd.DataFrame({column: sketch.ranks(chunk[column].to_numpy(dtype=float))
+                             for column, sketch in zip(self.columns, self.sketches)}, index=chunk.index)
+
+
+class CorrelationAccumulator:
+    """Pairwise-complete Pearson statistics for a fixed set of columns.
+
+    For every pair (i, j), ``n`` counts the rows where both are present,
+    ``mean`` and ``m2`` hold column i's mean and sum of squared deviations
+    over those rows and ``comoment`` the sum of the cross products of the
+    deviations. ``mean.T`` and ``m2.T`` give the same for column j.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+
+    def add(self, chunk):
+        """Fold a chunk of rows (a DataFrame holding ``columns``) into the statistics."""
+        x = chunk[self.columns].to_numpy(dtype=float)
+        valid = ~np.isnan(x)
+        # shift by the chunk's column means so the sums below stay small
+        with warnings.catch_warnings():
+            # all-NaN columns have no mean; they get a shift of 0
+            warnings.simplefilter('ignore', RuntimeWarning)
+            shift = np.nan_to_num(np.nanmean(x, axis=0))
+        centred = np.where(valid, x - shift, 0.0)
+        present = valid.astype(float)
+        n = present.T @ present
+        sums = centred.T @ present
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, sums / n, 0.0)
+        m2 = (centred ** 2).T @ present - sums * mean
+        comoment = centred.T @ centred - sums * mean.T
+        return self._merge(n, mean + shift[:, None], m2, comoment)
+
+    def merge(self, other):
+        """Fold in another accumulator over the same columns (e.g. from another worker)."""
+        if other.columns != self.columns:
+            raise ValueError("can only merge accumulators over the same columns")
+        return self._merge(other.n, other.mean, other.m2, other.comoment)
+
+    def _merge(self, n_b, mean_b, m2_b, comoment_b):
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, n_a * n_b / n, 0.0)
+            delta = mean_b - self.mean
+            self.mean = self.mean + np.where(n > 0, delta * n_b / n, 0.0)
+        self.m2 = self.m2 + m2_b + delta ** 2 * weight
+        self.comoment = self.comoment + comoment_b + delta * delta.T * weight
+        self.n = n
+        return self
+
+    def corr(self, min_periods=1):
+        """The correlation matrix, NaN where a pair has fewer than ``min_periods`` rows."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr = np.clip(corr, -1, 1)
+        corr[self.n < max(min_periods, 1)] = np.nan
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def _chunks(source, chunksize, read_csv_kwargs):
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize, **read_csv_kwargs)
+
+
+def _sketch_part(part, columns, chunksize, read_csv_kwargs):
+    seed, source = part
+    sketch = RankSketch(columns, seed=seed)
+    for chunk in _chunks(source, chunksize, read_csv_kwargs):
+        sketch.add(chunk)
+    return sketch
+
+
+def _accumulate_part(source, columns, chunksize, read_csv_kwargs, sketch=None):
+    accumulator = CorrelationAccumulator(columns)
+    for chunk in _chunks(source, chunksize, read_csv_kwargs):
+        accumulator.add(sketch.ranks(chunk) if sketch is not None else chunk)
+    return accumulator
+
+
+def streaming_corr(source, method='pearson', columns=None, chunksize=CHUNKSIZE, processes=None,
+                   min_periods=1, **read_csv_kwargs):
+    """Correlation matrix of a frame, a csv file, a glob pattern or a list of csv files.
+
+    Only one chunk per worker is in memory at a time. Files are spread over
+    worker processes and their accumulators merged. ``columns`` defaults to
+    the numeric columns of the first chunk. ``method`` is ``'pearson'`` or
+    ``'spearman'`` (approximate, from per-column rank sketches; this reads
+    the data twice).
+    """
+    if method not in ('pearson', 'spearman'):
+        raise ValueError("method must be 'pearson' or 'spearman'")
+    if isinstance(source, pd.DataFrame):
+        sources, processes = [source], 1
+    else:
+        sources = expand_paths(source, what='files to correlate')
+    if columns is None:
+        columns = numeric_columns(next(_chunks(sources[0], chunksize, read_csv_kwargs)))
+
+    sketch = None
+    if method == 'spearman':
+        # each part gets its own seed so the random keys of the parts are independent
+        sketches = parallel_map(_sketch_part, [(part, columns, chunksize, read_csv_kwargs)
+                                               for part in enumerate(sources)], processes)
+        sketch = sketches[0]
+        for part in sketches[1:]:
+            sketch.merge(part)
+    parts = parallel_map(_accumulate_part, [(source, columns, chunksize, read_csv_kwargs, sketch)
+                                            for source in sources], processes)
+    total = parts[0]
+    for part in parts[1:]:
+        total.merge(part)
+    return total.corr(min_periods=min_periods)
@@ -0,0 +1,145 @@
+# coding: utf-8
+"""Downsampling of long time series to what a chart can actually show.
+
+A line chart a few thousand pixels wide can't show more than a few
+thousand points, so sending it millions only makes the figure slow to
+build and (for plotly) huge to ship. ``decimate`` picks the rows worth
+drawing with one of two methods:
+
+* ``'lttb'`` (Largest-Triangle-Three-Buckets) keeps the visual shape of
+  smooth series such as prices;
+* ``'minmax'`` keeps the lowest and highest point of every bucket, so no
+  spike is lost, which suits volumes and returns.
+
+``resampled_line`` builds a plotly line chart from the decimated rows and,
+when ipywidgets is available, re-decimates the visible range whenever the
+chart is zoomed or the range slider is moved.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import plotly.express as px
+    import plotly.graph_objects as go
+except ImportError:
+    px = go = None
+
+# about the width of the notebooks' 16 inch figures, in pixels
+N_OUT = 2000
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').view(np.int64)
+    return values.astype(float)
+
+
+def lttb(x, y, n_out=N_OUT):
+    """Positions of the ``n_out`` points that best keep the shape of y(x).
+
+    The first and last points are always kept; every bucket in between
+    contributes the point making the largest triangle with the point kept
+    before it and the mean of the next bucket. ``x`` must be sorted and
+    ``y`` free of NaN.
+    """
+    x, y = _as_float(x), _as_float(y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the first and last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a])
+                      - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_out=N_OUT):
+    """Positions of the lowest and highest value in each of ``n_out // 2`` buckets."""
+    y = _as_float(y)
+    n, n_buckets = len(y), n_out // 2
+    if n <= n_out or n_buckets < 1:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    pad = n_buckets * size - n
+    lows = np.concatenate((np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf)))
+    highs = np.concatenate((np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf)))
+    starts = np.arange(n_buckets) * size
+    keep = np.concatenate((starts + lows.reshape(n_buckets, size).argmin(axis=1),
+                           starts + highs.reshape(n_buckets, size).argmax(axis=1)))
+    # buckets made only of padding point past the end
+    return np.unique(keep[keep < n])
+
+
+_METHODS = ('lttb', 'minmax')
+
+
+def decimate(frame, x, y, n_out=N_OUT, method='lttb', x_range=None):
+    """The rows of ``frame`` worth drawing for a line of ``y`` against ``x``.
+
+    ``y`` is a column or a list of columns; with several columns the rows
+    picked for each are combined. ``x_range`` is an optional ``(start,
+    end)`` pair limiting the rows to a visible window first. ``frame`` must
+    be sorted by ``x``. Rows where y is NaN are left out of the selection.
+    """
+    if method not in _METHODS:
+        raise ValueError("method must be one of {}".format(_METHODS))
+    if x_range is not None:
+        xs = frame[x].to_numpy()
+        start, end = (np.asarray(pd.to_datetime(bound), dtype=xs.dtype)
+                      if np.issubdtype(xs.dtype, np.datetime64) else bound for bound in x_range)
+        lo, hi = np.searchsorted(xs, start, side='left'), np.searchsorted(xs, end, side='right')
+        # one point either side so the line runs to the edges of the window
+        frame = frame.iloc[max(lo - 1, 0):hi + 1]
+    columns = [y] if isinstance(y, str) else list(y)
+    xs = frame[x].to_numpy()
+    keep = []
+    for column in columns:
+        values = _as_float(frame[column].to_numpy())
+        valid = np.flatnonzero(~np.isnan(values))
+        if method == 'lttb':
+            picked = lttb(xs[valid], values[valid], n_out)
+        else:
+            picked = minmax(values[valid], n_out)
+        keep.append(valid[picked])
+    return frame.iloc[np.unique(np.concatenate(keep))]
+
+
+def resampled_line(frame, x, y, n_out=N_OUT, method='lttb', **px_kwargs):
+    """``px.line`` over the decimated rows, re-decimated when the x range changes.
+
+    ``px_kwargs`` go to ``px.line`` (``title=...`` and so on). Inside
+    Jupyter with ipywidgets installed the result is a ``FigureWidget`` that
+    re-picks ``n_out`` points from the visible window whenever it is zoomed,
+    panned or moved with the range slider, so zooming in shows full detail.
+    Without ipywidgets a plain figure with the decimated rows is returned.
+    """
+    if px is None:
+        raise ImportError("resampled_line needs plotly")
+    columns = [y] if isinstance(y, str) else list(y)
+    fig = px.line(decimate(frame, x, columns, n_out, method), x=x, y=y, **px_kwargs)
+    try:
+        fig = go.FigureWidget(fig)
+    except ImportError:
+        return fig
+
+    def redraw(layout, x_range):
+        window = None if x_range is None else tuple(x_range)
+        rows = decimate(frame, x, columns, n_out, method, x_range=window)
+        with fig.batch_update():
+            # px.line makes one trace per column, in the order given
+            for trace, column in zip(fig.data, columns):
+                trace.x, trace.y = rows[x], rows[column]
+
+    fig.layout.on_change(redraw, 'xaxis.range')
+    return fig
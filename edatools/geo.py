@@ -0,0 +1,130 @@
+# coding: utf-8
+"""Uniform grid index over latitude/longitude points.
+
+The points are bucketed once into square cells of ``cell_km`` kilometres
+(on a local equirectangular projection, which is accurate to well under
+a percent across a city) and stored sorted by cell, so every cell's
+points are one contiguous slice. A bounding-box or radius query then only
+looks at the cells it overlaps instead of scanning every point, and
+per-cell aggregates and density maps come from one ``bincount``.
+
+    grid = GridIndex(air_bnb['latitude'], air_bnb['longitude'])
+    near = grid.radius(40.758, -73.9855, km=1)
+    air_bnb['price'].iloc[near].median()
+"""
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+# the grid is dense, so a stray point far away (a 0,0 pickup) would blow it up
+MAX_CELLS = 10_000_000
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; any argument may be an array."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class GridIndex:
+    """Points bucketed into ``cell_km`` square cells, for fast spatial queries.
+
+    Query results are row positions into the original arrays (use them
+    with ``.iloc``). Points with a missing coordinate are left out, and so
+    are points outside ``bounds`` = (lat_min, lat_max, lon_min, lon_max)
+    when it is given. The grid spans the kept points and may have at most
+    ``MAX_CELLS`` cells; past that a ValueError asks for ``bounds`` or a
+    bigger ``cell_km``.
+    """
+
+    def __init__(self, lat, lon, cell_km=0.5, bounds=None):
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        keep = ~(np.isnan(lat) | np.isnan(lon))
+        if bounds is not None:
+            lat_min, lat_max, lon_min, lon_max = bounds
+            keep &= (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        valid = np.flatnonzero(keep)
+        if not len(valid):
+            raise ValueError("no points with both coordinates inside the bounds")
+        self.cell_km = cell_km
+        self.lat0, self.lon0 = lat[valid].min(), lon[valid].min()
+        # one degree of longitude shrinks with latitude; use the middle of the data
+        self._x_scale = KM_PER_DEGREE * np.cos(np.radians(np.median(lat[valid])))
+        ix, iy = self._cell_xy(lat[valid], lon[valid])
+        self.nx, self.ny = int(ix.max()) + 1, int(iy.max()) + 1
+        if self.nx * self.ny > MAX_CELLS:
+            raise ValueError("the points span {} x {} cells of {} km; pass bounds= to leave out stray points "
+                             "or use a bigger cell_km".format(self.nx, self.ny, cell_km))
+        cells = iy * self.nx + ix
+        order = np.argsort(cells, kind='stable')
+        self.positions = valid[order]
+        self.lat, self.lon = lat[self.positions], lon[self.positions]
+        self.cells = cells[order]
+        # points of cell c are positions[starts[c]:starts[c + 1]]
+        self.starts = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=self.nx * self.ny))))
+
+    def _cell_xy(self, lat, lon):
+        ix = np.floor((lon - self.lon0) * self._x_scale / self.cell_km).astype(np.int64)
+        iy = np.floor((lat - self.lat0) * KM_PER_DEGREE / self.cell_km).astype(np.int64)
+        return ix, iy
+
+    def _candidates(self, lat_min, lat_max, lon_min, lon_max):
+        """Sorted-order slots of the points in every cell the box overlaps."""
+        (ix0, ix1), (iy0, iy1) = self._cell_xy(np.array([lat_min, lat_max]), np.array([lon_min, lon_max]))
+        ix0, ix1 = max(ix0, 0), min(ix1, self.nx - 1)
+        iy0, iy1 = max(iy0, 0), min(iy1, self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.empty(0, dtype=np.int64)
+        # cells ix0..ix1 of one grid row are adjacent, so each row is a single slice
+        rows = np.arange(iy0, iy1 + 1) * self.nx
+        return np.concatenate([np.arange(self.starts[row + ix0], self.starts[row + ix1 + 1]) for row in rows])
+
+    def bbox(self, lat_min, lat_max, lon_min, lon_max):
+        """Row positions of the points inside a latitude/longitude box."""
+        slots = self._candidates(lat_min, lat_max, lon_min, lon_max)
+        lat, lon = self.lat[slots], self.lon[slots]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(self.positions[slots[inside]])
+
+    def radius(self, lat, lon, km):
+        """Row positions of the points within ``km`` kilometres of (lat, lon)."""
+        dlat = km / KM_PER_DEGREE
+        dlon = km / (KM_PER_DEGREE * max(np.cos(np.radians(lat + np.sign(lat) * dlat)), 1e-12))
+        slots = self._candidates(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        inside = haversine_km(lat, lon, self.lat[slots], self.lon[slots]) <= km
+        return np.sort(self.positions[slots[inside]])
+
+    def cell_centres(self, cells):
+        """Latitude and longitude of the centres of the given cell ids."""
+        iy, ix = np.divmod(np.asarray(cells), self.nx)
+        lat = self.lat0 + (iy + 0.5) * self.cell_km / KM_PER_DEGREE
+        lon = self.lon0 + (ix + 0.5) * self.cell_km / self._x_scale
+        return lat, lon
+
+    def cell_stats(self, values, median=False):
+        """count, mean (and median) of ``values`` per non-empty cell, with the cell centres.
+
+        ``values`` is aligned with the points the index was built from.
+        """
+        values = np.asarray(values, dtype=float)[self.positions]
+        valid = ~np.isnan(values)
+        size = self.nx * self.ny
+        counts = np.bincount(self.cells[valid], minlength=size)
+        sums = np.bincount(self.cells[valid], weights=values[valid], minlength=size)
+        cells = np.flatnonzero(counts)
+        lat, lon = self.cell_centres(cells)
+        stats = pd.DataFrame({'lat': lat, 'lon': lon, 'count': counts[cells], 'mean': sums[cells] / counts[cells]},
+                             index=pd.Index(cells, name='cell'))
+        if median:
+            stats['median'] = pd.Series(values[valid]).groupby(self.cells[valid]).median()
+        return stats
+
+    def density(self):
+        """(ny, nx) array of points per cell, south to north, plus the (lon, lat) extent for imshow."""
+        counts = np.diff(self.starts).reshape(self.ny, self.nx)
+        extent = (self.lon0, self.lon0 + self.nx * self.cell_km / self._x_scale,
+                  self.lat0, self.lat0 + self.ny * self.cell_km / KM_PER_DEGREE)
+        return counts, extent
@@ -0,0 +1,47 @@
+# coding: utf-8
+"""Spreading work over files and worker processes.
+
+The multi-file entry points (pickup counts, ticker summaries, correlation,
+the FB rollups) all take a glob, a directory or a list of files and run one
+task per file in a process pool, merging the partial results afterwards.
+
+    paths = expand_paths('ride_data/*.csv')
+    parts = parallel_map(count_pickups, [(path,) for path in paths])
+"""
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def expand_paths(source, extensions=None, what='files'):
+    """Sorted files of a glob pattern, a directory or a list of paths.
+
+    ``extensions`` (e.g. ``('.csv', '.parquet')``) keeps only those files.
+    Raises FileNotFoundError when nothing is left; ``what`` names the
+    files in the message.
+    """
+    if isinstance(source, str):
+        pattern = os.path.join(source, '*') if os.path.isdir(source) else source
+        source = glob.glob(pattern)
+    paths = sorted(source)
+    if extensions is not None:
+        paths = [path for path in paths if os.path.splitext(path)[1] in extensions]
+    if not paths:
+        raise FileNotFoundError("no {} found".format(what))
+    return paths
+
+
+def parallel_map(function, items, processes=None, chunksize=1):
+    """``[function(*item) for item in items]``, in worker processes when there are several.
+
+    ``processes`` defaults to the number of cores and is capped by the
+    number of items; with one it all runs in this process. ``function``
+    must be picklable, i.e. defined at module level.
+    """
+    items = list(items)
+    processes = min(processes or os.cpu_count() or 1, len(items))
+    if processes <= 1:
+        return [function(*item) for item in items]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(function, *zip(*items), chunksize=chunksize))
@@ -0,0 +1,196 @@
+# coding: utf-8
+"""Headless batch run of the EDA notebooks' exported scripts.
+
+The ``.py`` exports call ``get_ipython()``, ``init_notebook_mode`` and
+``cf.go_offline()``, and rely on the inline backend to show every cell's
+figures, so they don't run as plain Python. ``render_script`` executes a
+script cell by cell (the ``# In[n]:`` markers) in its own folder, with
+matplotlib on the Agg backend and the notebook-only calls made no-ops.
+After every cell the figures it left open are written out and closed,
+like the inline backend does, and plotly figures that would be shown
+are written as standalone HTML. Scripts run in parallel in separate
+worker processes:
+
+    python -m edatools.render --out build/figures --formats png svg
+
+A cell that raises stops its script (the later cells depend on it); the
+error and the per-cell timings are kept in ``render.json``.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CELL = re.compile(r'^# In\[[^\]]*\]:\s*$', re.MULTILINE)
+
+
+def find_scripts(root=ROOT):
+    """Notebook exports under ``root``: the .py files with ``# In[n]:`` cell markers."""
+    scripts = []
+    for path in sorted(glob.glob(os.path.join(root, '*', '*.py'))):
+        with open(path, encoding='utf-8') as f:
+            if _CELL.search(f.read()):
+                scripts.append(path)
+    return scripts
+
+
+def split_cells(source):
+    """The code of each cell, in order; anything before the first marker is cell 0."""
+    return _CELL.split(source)
+
+
+class _FakeIPython:
+    """Stands in for ``get_ipython()``; magics such as ``%matplotlib inline`` do nothing."""
+
+    def run_line_magic(self, *args, **kwargs):
+        return None
+
+    def run_cell_magic(self, *args, **kwargs):
+        return None
+
+
+class _Sink:
+    """Writes the figures a script produces into its output folder."""
+
+    def __init__(self, outdir, formats):
+        self.outdir = outdir
+        self.formats = formats
+        self.cell = 0
+        self.count = 0
+        self.files = []
+
+    def _path(self, ext):
+        self.count += 1
+        return os.path.join(self.outdir, 'cell{:03d}-fig{:03d}.{}'.format(self.cell, self.count, ext))
+
+    def flush_matplotlib(self):
+        import matplotlib.pyplot as plt
+        for number in plt.get_fignums():
+            figure = plt.figure(number)
+            path = self._path('')
+            for fmt in self.formats:
+                figure.savefig(path + fmt, bbox_inches='tight')
+                self.files.append(path + fmt)
+        plt.close('all')
+
+    def plotly(self, figure, *args, **kwargs):
+        import plotly.io
+        path = self._path('html')
+        # one plotly.js next to the pages instead of a copy in every file
+        plotly.io.write_html(figure, path, include_plotlyjs='directory')
+        self.files.append(path)
+
+
+def _headless(sink):
+    """Switch matplotlib to Agg and route notebook-only display calls to ``sink``."""
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.show = lambda *args, **kwargs: sink.flush_matplotlib()
+
+    try:
+        import plotly.basedatatypes
+        import plotly.offline
+        import plotly.offline.offline
+    except ImportError:
+        pass
+    else:
+        plotly.basedatatypes.BaseFigure.show = lambda figure, *args, **kwargs: sink.plotly(figure)
+        plotly.offline.iplot = lambda figure, *args, **kwargs: sink.plotly(figure)
+        plotly.offline.init_notebook_mode = lambda *args, **kwargs: None
+        # cufflinks' iplot only goes through plotly.offline.iplot when offline mode looks
+        # initialized; otherwise it takes the online chart_studio route and fails
+        plotly.offline.__PLOTLY_OFFLINE_INITIALIZED = True
+        plotly.offline.offline.__PLOTLY_OFFLINE_INITIALIZED = True
+    try:
+        import cufflinks
+    except ImportError:
+        pass
+    else:
+        cufflinks.go_offline = lambda *args, **kwargs: None
+
+
+def render_script(path, outdir, formats=('png',)):
+    """Run one exported notebook headlessly and write its figures to ``outdir/<script>``.
+
+    Returns a json-friendly summary: cells run, figure files, per-cell
+    seconds and the traceback of the cell that failed, if any.
+    """
+    path = os.path.abspath(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    target = os.path.join(os.path.abspath(outdir), re.sub(r'\W+', '_', name).strip('_'))
+    os.makedirs(target, exist_ok=True)
+    sink = _Sink(target, formats)
+    summary = {'script': os.path.relpath(path, ROOT), 'cells': 0, 'seconds': [], 'error': None}
+    start = time.perf_counter()
+
+    # the notebooks load their data and helpers relative to their own folder
+    os.chdir(os.path.dirname(path))
+    sys.path.insert(0, os.path.dirname(path))
+    sys.argv = [path]
+    _headless(sink)
+    namespace = {'__name__': '__main__', '__file__': path, 'get_ipython': _FakeIPython}
+    with open(path, encoding='utf-8') as f:
+        cells = split_cells(f.read())
+    for number, cell in enumerate(cells):
+        sink.cell = number
+        cell_start = time.perf_counter()
+        try:
+            exec(compile(cell, '{} [cell {}]'.format(path, number), 'exec'), namespace)
+            sink.flush_matplotlib()
+        except Exception:
+            summary['error'] = traceback.format_exc()
+            break
+        finally:
+            summary['seconds'].append(round(time.perf_counter() - cell_start, 3))
+        summary['cells'] += 1
+    summary['total_seconds'] = round(time.perf_counter() - start, 3)
+    summary['figures'] = [os.path.relpath(file, os.path.abspath(outdir)) for file in sink.files]
+    return summary
+
+
+def render_all(scripts=None, outdir='figures', formats=('png',), processes=None):
+    """Render several scripts, each in a fresh worker process, and write ``render.json``."""
+    scripts = scripts or find_scripts()
+    summaries = []
+    if scripts:
+        processes = min(processes or os.cpu_count() or 1, len(scripts))
+        # spawn, and one script per worker, so no script sees another one's imports or state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, max_tasks_per_child=1) as pool:
+            summaries = list(pool.map(render_script, scripts, [outdir] * len(scripts),
+                                      [tuple(formats)] * len(scripts)))
+    os.makedirs(outdir, exist_ok=True)
+    with open(os.path.join(outdir, 'render.json'), 'w') as f:
+        json.dump(summaries, f, indent=2)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the notebook exports headlessly and save their figures.")
+    parser.add_argument('scripts', nargs='*', help='scripts to run (default: every notebook export in the repo)')
+    parser.add_argument('--out', default='figures', help='output folder')
+    parser.add_argument('--formats', nargs='+', default=['png'], help='matplotlib formats, e.g. png svg')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    summaries = render_all(args.scripts or None, args.out, args.formats, args.processes)
+    for summary in summaries:
+        status = 'ok' if summary['error'] is None else 'failed in cell {}'.format(summary['cells'])
+        print('{:<60} {:>3} cells {:>3} figures {:>8.1f}s  {}'.format(
+            summary['script'], summary['cells'], len(summary['figures']), summary['total_seconds'], status))
+    if any(summary['error'] for summary in summaries):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
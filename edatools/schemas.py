@@ -0,0 +1,118 @@
+# coding: utf-8
+"""Declared dtypes for the datasets the notebooks load.
+
+Each schema maps a column to ``'category'`` or to a concrete dtype. The
+low-cardinality string columns become categoricals so the groupbys and
+countplots work on integer codes, and every numeric column is downcast to
+the smallest width that holds its values exactly. Integers are not taken
+below ``INT_FLOOR``: the notebooks add count columns together, and a sum
+of two int16 counts wraps around past 32767.
+"""
+
+import numpy as np
+import pandas as pd
+
+# narrowest integer type a column is downcast to
+INT_FLOOR = np.int32
+
+SCHEMAS = {
+    'fb': {
+        'gender': 'category',
+    },
+    'air_bnb': {
+        'neighbourhood_group': 'category',
+        'room_type': 'category',
+    },
+    'olympics': {
+        'City': 'category',
+        'Sport': 'category',
+        'Discipline': 'category',
+        'Country': 'category',
+        'Gender': 'category',
+        'Event': 'category',
+        'Medal': 'category',
+    },
+    # 2015 raw trip files
+    'uber': {
+        'Dispatching_base_num': 'category',
+        'Affiliated_base_num': 'category',
+    },
+    # 2014 raw trip files, one per month
+    'uber_2014': {
+        'Base': 'category',
+    },
+    'tesla': {
+        'Date': 'datetime64[ns]',
+    },
+    'nepal_crop': {},
+}
+
+
+def _downcast(col, int_floor=INT_FLOOR):
+    """Smallest integer (no narrower than ``int_floor``) or float width that holds ``col`` exactly."""
+    if pd.api.types.is_bool_dtype(col) or not pd.api.types.is_numeric_dtype(col):
+        return col
+    if pd.api.types.is_integer_dtype(col):
+        small = pd.to_numeric(col, downcast='integer')
+        # the values fit, but sums of them might not: keep room for arithmetic
+        if small.dtype.itemsize < np.dtype(int_floor).itemsize:
+            return small.astype(int_floor)
+        return small
+    small = col.astype(np.float32)
+    # only keep float32 if nothing is lost on the way back
+    if np.array_equal(small.to_numpy(np.float64), col.to_numpy(np.float64), equal_nan=True):
+        return small
+    return col
+
+
+def check_schema(df, schema):
+    """Raise ValueError if ``df`` does not match the declared ``schema``.
+
+    Columns left out of ``df`` (e.g. by a column selection) are not checked.
+    """
+    errors = []
+    for col, dtype in schema.items():
+        if col not in df:
+            continue
+        if dtype == 'category':
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                errors.append("{} is {}, expected category".format(col, df[col].dtype))
+        elif df[col].dtype != np.dtype(dtype):
+            errors.append("{} is {}, expected {}".format(col, df[col].dtype, dtype))
+    if errors:
+        raise ValueError("schema mismatch: " + "; ".join(errors))
+
+
+def optimize_dtypes(df, schema=None, name=None, report=True, int_floor=INT_FLOOR):
+    """Apply ``schema`` and downcast the remaining numeric columns.
+
+    ``schema`` is a dict or the name of one of ``SCHEMAS``. Every declared
+    column must be present. Integer columns are not made narrower than
+    ``int_floor``. Returns the new frame and, when ``report`` is set,
+    prints how much memory was saved.
+    """
+    if isinstance(schema, str):
+        name = name or schema
+        schema = SCHEMAS[schema]
+    schema = schema or {}
+    missing = [col for col in schema if col not in df]
+    if missing:
+        raise ValueError("{} is missing the declared columns {}".format(name or 'frame', missing))
+
+    before = df.memory_usage(deep=True).sum()
+    df = df.copy()
+    for col in df.columns:
+        dtype = schema.get(col)
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+        elif dtype is not None:
+            df[col] = df[col].astype(dtype)
+        else:
+            df[col] = _downcast(df[col], int_floor)
+    check_schema(df, schema)
+
+    if report:
+        after = df.memory_usage(deep=True).sum()
+        print("{}: {:.1f} MB -> {:.1f} MB ({:.0%} saved)".format(
+            name or 'frame', before / 1e6, after / 1e6, 1 - after / before if before else 0))
+    return df